@@ -1249,6 +1249,12 @@ class Goofy:
         paths.DATA_LOG_DIR, paths.DATA_STATE_DIR, paths.DATA_TESTS_DIR]:
       file_utils.TryMakeDirs(path)
 
+    # Start prespawning pytest processes as early as possible, so they are
+    # warmed up in parallel with the rest of the initialization.  Changes to
+    # os.environ made after this point are sent to the processes on spawn.
+    self.pytest_prespawner = prespawner.PytestPrespawner()
+    self.pytest_prespawner.start()
+
     try:
       goofy_default_options = config_utils.LoadConfig(validate_schema=False)
       for key, value in goofy_default_options.items():
@@ -1355,9 +1361,6 @@ class Goofy:
               state=test_state.ToStruct()))
     self.test_list.state_change_callback = state_change_callback
 
-    self.pytest_prespawner = prespawner.PytestPrespawner()
-    self.pytest_prespawner.start()
-
     tests_after_shutdown = self.state_instance.DataShelfGetValue(
         TESTS_AFTER_SHUTDOWN, optional=True)
     force_auto_run = (tests_after_shutdown == FORCE_AUTO_RUN)
@@ -1467,16 +1470,28 @@ class Goofy:
     root = root or self.test_list
     self._RunTestsWithStatus([TestState.UNTESTED, TestState.ACTIVE], root=root)
 
-  def Wait(self):
+  def Wait(self, timeout=None):
     """Waits for all pending invocations.
 
     Useful for testing.
+
+    Args:
+      timeout: Seconds to wait for each invocation thread to finish, or None to
+        wait forever.  This is not a bound on the whole call, which may wait for
+        several invocations in turn.
+
+    Returns:
+      True if all invocations are done, or False if an invocation thread is
+      still running after the timeout.
     """
     while self.invocations:
-      for invoc in self.invocations.values():
+      for invoc in list(self.invocations.values()):
         logging.info('Waiting for %s to complete...', invoc.test)
-        invoc.thread.join()
+        invoc.thread.join(timeout)
+        if invoc.thread.is_alive():
+          return False
       self.ReapCompletedTests()
+    return True
 
   def _TestFail(self, test):
     self.hooks.OnTestFailure(test)
@@ -7,15 +7,17 @@
 
 import argparse
 import base64
+import functools
 import glob
 import inspect
 import json
 import logging
 import os
-import queue
-import random
 import re
+import secrets
+import subprocess
 import tempfile
+import threading
 import time
 import uuid
 import xmlrpc.client
@@ -54,6 +56,9 @@ class GoofyRPCException(Exception):
 class GoofyRPC:
   """Goofy RPC main class."""
 
+  # Names of the methods exported by RegisterMethods, found on first use.
+  _rpc_method_names = None
+
   def _InRunQueue(self, func, timeout_secs=None):
     """Runs a function in the Goofy run queue.
 
@@ -68,23 +73,24 @@ class GoofyRPC:
     Raises:
       Any exception raised by the function.
     """
-    # A queue to store the results of evaluating the function.  This
-    # will contain a two-element tuple (ret, exc), where ret is the
-    # return value or exc is any exception thrown.  Only one will be
-    # set.
-    result = queue.Queue()
+    # The results of evaluating the function, as [ret, exc], where ret is the
+    # return value or exc is any exception thrown.  Only one will be set.
+    # done is set once the result is available.
+    result = [None, None]
+    done = threading.Event()
 
     def Target():
       try:
-        # Call the function, and put the the return value on success.
-        result.put((func(), None))
+        # Call the function, and store the return value on success.
+        result[0] = func()
       except Exception as e:
-        # Failure; put e.
+        # Failure; store e.
         logging.exception('Exception in RPC handler')
-        result.put((None, e))
+        result[1] = e
       except:  # pylint: disable=bare-except
         # Failure (but not an Exception); wrap whatever it is in an exception.
-        result.put((None, GoofyRPCException(debug_utils.FormatExceptionOnly())))
+        result[1] = GoofyRPCException(debug_utils.FormatExceptionOnly())
+      done.set()
 
     def _GetFuncString():
       func_string = func.__name__
@@ -96,11 +102,10 @@ class GoofyRPC:
       return func_string
 
     self.goofy.RunEnqueue(Target)
-    try:
-      ret, exc = result.get(block=True, timeout=timeout_secs)
-    except queue.Empty:
+    if not done.wait(timeout_secs):
       raise GoofyRPCException('Time out waiting for %s to complete' %
                               _GetFuncString())
+    ret, exc = result
     if exc:
       raise exc
     return ret
@@ -113,22 +118,17 @@ class GoofyRPC:
 
   def RegisterMethods(self, state_instance):
     """Registers exported RPC methods in a state object."""
-    for name, m in inspect.getmembers(self):
+    if GoofyRPC._rpc_method_names is None:
       # Find all non-private methods (except this one)
-      if ((not inspect.ismethod(m)) or
-          name.startswith('_') or
-          name == 'RegisterMethods'):
-        continue
-
-      # Bind the state instance method to our method.  (We need to
-      # put this in a separate method to rebind m, since it will
-      # change during the next for loop iteration.)
-      def SetEntry(m):
-        # pylint: disable=unnecessary-lambda,cell-var-from-loop
-        state_instance.__dict__[name] = (
-            lambda *args, **kwargs: m(*args, **kwargs))
-        # pylint: enable=unnecessary-lambda,cell-var-from-loop
-      SetEntry(m)
+      GoofyRPC._rpc_method_names = [
+          name for name, value in vars(GoofyRPC).items()
+          if (inspect.isfunction(value) and
+              not name.startswith('_') and
+              name != 'RegisterMethods')]
+
+    # Bound methods can be called by the RPC server as they are.
+    for name in GoofyRPC._rpc_method_names:
+      state_instance.__dict__[name] = getattr(self, name)
 
   def FlushEventLogs(self):
     """Flushes event logs if an event_log_watcher is available.
@@ -159,13 +159,20 @@ class GoofyRPC:
         restart_time: The time at which the system will restart (on success).
         error_msg: An error message (on failure).
     """
-    ret_value = queue.Queue()
+    # The value to return, set by the first of the callbacks below to finish.
+    ret_value = []
+    done = threading.Event()
+
+    def SetReturnValue(value):
+      if not done.is_set():
+        ret_value.append(value)
+        done.set()
 
     def PostUpdateHook():
       # After update, wait REBOOT_AFTER_UPDATE_DELAY_SECS before the
       # update, and return a value to the caller.
       now = time.time()
-      ret_value.put({
+      SetReturnValue({
           'success': True, 'updated': True,
           'restart_time': now + REBOOT_AFTER_UPDATE_DELAY_SECS,
           'error_msg': None})
@@ -177,27 +184,31 @@ class GoofyRPC:
             auto_run_on_restart=True,
             post_update_hook=PostUpdateHook)
         # Returned... which means that no update was necessary.
-        ret_value.put({
+        SetReturnValue({
             'success': True, 'updated': False, 'restart_time': None,
             'error_msg': None})
       except Exception:
         # There was an update available, but we couldn't get it.
         logging.exception('Update failed')
-        ret_value.put({
+        SetReturnValue({
             'success': False, 'updated': False, 'restart_time': None,
             'error_msg': debug_utils.FormatExceptionOnly()})
 
     self.goofy.RunEnqueue(Target)
-    return ret_value.get()
+    done.wait()
+    return ret_value[0]
 
   def AddNote(self, note):
     note['timestamp'] = int(time.time())
+    # Write the event log from the run queue, so the caller doesn't wait for
+    # the disk.
     # TODO(stimim): log this by testlog.
-    self.goofy.event_log.Log('note',
-                             name=note['name'],
-                             text=note['text'],
-                             timestamp=note['timestamp'],
-                             level=note['level'])
+    self.goofy.RunEnqueue(functools.partial(
+        self.goofy.event_log.Log, 'note',
+        name=note['name'],
+        text=note['text'],
+        timestamp=note['timestamp'],
+        level=note['level']))
     logging.info('Factory note from %s at %s (level=%s): %s',
                  note['name'], note['timestamp'], note['level'],
                  note['text'])
@@ -277,7 +288,7 @@ class GoofyRPC:
         archive_key: A "key" that may later be used to refer to the archive.
             This is just a randomly-chosen 8-digit number.
     """
-    archive_key = '%08d' % random.SystemRandom().randint(0, 1e8)
+    archive_key = '%08d' % secrets.randbelow(10 ** 8)
     archive_id = '.'.join([re.sub('[^A-Za-z0-9.]', '_', x)
                            for x in (archive_key, name, serial, description)])
     output_file = factory_bug.SaveLogs(tempfile.gettempdir(),
@@ -289,7 +300,7 @@ class GoofyRPC:
               os.path.basename(output_file),
               xmlrpc.client.Binary(data))
       return {'name': os.path.basename(output_file),
-              'size': os.path.getsize(output_file),
+              'size': len(data),
               'key': archive_key}
     finally:
       file_utils.TryUnlink(output_file)
@@ -370,11 +381,11 @@ class GoofyRPC:
     ret = []
     states = self.goofy.state_instance.GetTestStates()
     for t in self.goofy.test_list.Walk(in_order=True):
-      test_state = states.get(t.path)
-      ret.append(dict(path=t.path,
-                      parent=(t.subtests != []),
-                      pending=t.path in paths_to_run,
-                      **test_state.__dict__))
+      test = states[t.path].__dict__.copy()
+      test['path'] = t.path
+      test['parent'] = bool(t.subtests)
+      test['pending'] = t.path in paths_to_run
+      ret.append(test)
     return ret
 
   def IsReadyForUIConnection(self):
@@ -528,15 +539,20 @@ class GoofyRPC:
 
     # Reset goofy_ghost so the test list in overlord is correct.
     process_utils.Spawn(['goofy_ghost', 'reset'], call=True)
-    # Restart Goofy and clear state.
-    process_utils.Spawn(
-        ['nohup ' +
-         os.path.join(paths.FACTORY_DIR, 'bin', 'factory_restart') +
-         ' -a &'],
-        shell=True, check_call=True)
+    # Restart Goofy and clear state.  factory_restart kills this process, so
+    # run it in its own session.
+    process = process_utils.Spawn(
+        [os.path.join(paths.FACTORY_DIR, 'bin', 'factory_restart'), '-a'],
+        start_new_session=True)
     # Wait for a while.  This process should be killed long before
     # 60 seconds have passed.
-    time.sleep(60)
+    try:
+      returncode = process.wait(timeout=60)
+    except subprocess.TimeoutExpired as e:
+      raise GoofyRPCException('Factory did not restart as expected') from e
+    if returncode:
+      raise GoofyRPCException(
+          'Failed to restart factory (exit code %d)' % returncode)
     # This should never be reached, but not much we can do but
     # complain to the caller.
     raise GoofyRPCException('Factory did not restart as expected')
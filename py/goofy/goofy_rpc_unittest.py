@@ -12,6 +12,7 @@ from unittest import mock
 from cros.factory.goofy import goofy
 from cros.factory.goofy import goofy_rpc
 from cros.factory.test.env import paths
+from cros.factory.test import state
 from cros.factory.test.test_lists import test_list as test_list_module
 from cros.factory.utils import file_utils
 
@@ -32,6 +33,73 @@ class GoofyRPCTest(unittest.TestCase):
     self.goofy = mock.Mock(goofy)
     self.goofy_rpc = goofy_rpc.GoofyRPC(self.goofy)
 
+  def testRegisterMethods(self):
+    state_instance = mock.Mock()
+    self.goofy_rpc.RegisterMethods(state_instance)
+    self.goofy.test_list = mock.Mock(test_list_module.FactoryTestList)
+    self.goofy.test_list.ToStruct.return_value = 'data'
+    self.assertEqual('data', state_instance.__dict__['GetTestList']())
+    self.assertNotIn('RegisterMethods', state_instance.__dict__)
+    self.assertNotIn('_InRunQueue', state_instance.__dict__)
+
+  def testInRunQueue(self):
+    self.goofy.RunEnqueue = mock.Mock(side_effect=lambda target: target())
+    # pylint: disable=protected-access
+    self.assertEqual('foo', self.goofy_rpc._InRunQueue(lambda: 'foo'))
+
+    def Raise():
+      raise ValueError('bar')
+    self.assertRaisesRegex(
+        ValueError, 'bar', self.goofy_rpc._InRunQueue, Raise)
+
+  def testInRunQueueTimeout(self):
+    # Never run the function.
+    self.goofy.RunEnqueue = mock.Mock()
+    # pylint: disable=protected-access
+    self.assertRaisesRegex(
+        goofy_rpc.GoofyRPCException, 'Time out',
+        self.goofy_rpc._InRunQueue, lambda: 'foo', timeout_secs=0.01)
+
+  def testAddNote(self):
+    run_queue = []
+    self.goofy.RunEnqueue = mock.Mock(side_effect=run_queue.append)
+    self.goofy.event_log = mock.Mock()
+    self.goofy.state_instance = mock.Mock()
+    self.goofy.Stop = mock.Mock()
+    self.goofy.event_client = mock.Mock()
+    note = {'name': 'foo', 'text': 'bar', 'level': 'CRITICAL'}
+
+    self.goofy_rpc.AddNote(note)
+    self.goofy.state_instance.DataShelfAppendToList.assert_called_once_with(
+        'factory_note', note)
+    # The event log is written later in the run queue.
+    self.goofy.event_log.Log.assert_not_called()
+    for func in run_queue:
+      func()
+    self.goofy.event_log.Log.assert_called_once_with(
+        'note', name='foo', text='bar', timestamp=note['timestamp'],
+        level='CRITICAL')
+    self.goofy.Stop.assert_called_once_with()
+
+  def testGetTests(self):
+    parent = mock.Mock(path='a', subtests=[mock.Mock()])
+    child = mock.Mock(path='a.b', subtests=[])
+    self.goofy.test_list = mock.Mock()
+    self.goofy.test_list.Walk.return_value = [parent, child]
+    self.goofy.test_list_iterator = mock.Mock()
+    self.goofy.test_list_iterator.GetPendingTests.return_value = ['a.b']
+    self.goofy.state_instance = mock.Mock()
+    self.goofy.state_instance.GetTestStates.return_value = {
+        'a': state.TestState(status=state.TestState.PASSED),
+        'a.b': state.TestState(status=state.TestState.UNTESTED)}
+
+    # pylint: disable=protected-access
+    tests = self.goofy_rpc._GetTests()
+    self.assertEqual(
+        [('a', True, False, state.TestState.PASSED),
+         ('a.b', False, True, state.TestState.UNTESTED)],
+        [(t['path'], t['parent'], t['pending'], t['status']) for t in tests])
+
   def testGetTestList(self):
     test_list = "data"
     self.goofy.test_list = mock.Mock(test_list_module.FactoryTestList)
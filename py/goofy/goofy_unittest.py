@@ -40,6 +40,11 @@ from cros.factory.utils import process_utils
 _PytestInfo = collections.namedtuple('_PytestInfo',
                                      ['test_state', 'error_msg', 'func'])
 
+# Event types checked for every event received by the web socket client.
+_EVENT_TYPE_HELLO = Event.Type.HELLO
+_EVENT_TYPE_KEEPALIVE = Event.Type.KEEPALIVE
+_EVENT_TYPE_STATE_CHANGE = Event.Type.STATE_CHANGE
+
 
 def MockPytest(pytest_info_mapping, spawn_mock):
   """Adds a side effect that a mock pytest will be executed.
@@ -155,7 +160,7 @@ class GoofyTest(unittest.TestCase):
     Waits for any pending invocations in Goofy to complete,
     and verifies and resets all mocks.
     """
-    self.goofy.Wait()
+    self.assertTrue(self.goofy.Wait(timeout=5.0))
 
   def BeforeInitGoofy(self):
     """Hook invoked before InitGoofy."""
@@ -213,6 +218,9 @@ class GoofyUITest(GoofyTest):
     self.ws_done = threading.Event()
 
   def AfterInitGoofy(self):
+    append_event = self.events.append
+    ws_start = self.ws_start
+
     class MyClient(WebSocketBaseClient):
       """The web socket client class."""
       # pylint: disable=no-self-argument
@@ -222,11 +230,11 @@ class GoofyUITest(GoofyTest):
       def received_message(socket_self, message):
         event = Event.from_json(str(message))
         logging.info('Test client received %s', event)
-        self.events.append(event)
-        if event.type == Event.Type.HELLO:
-          socket_self.send(Event(Event.Type.KEEPALIVE,
+        append_event(event)
+        if event.type == _EVENT_TYPE_HELLO:
+          socket_self.send(Event(_EVENT_TYPE_KEEPALIVE,
                                  uuid=event.uuid).to_json())
-          self.ws_start.set()
+          ws_start.set()
 
     ws = MyClient('ws://%s:%d/event' %
                   (net_utils.LOCALHOST, goofy_proxy.DEFAULT_GOOFY_PORT),
@@ -293,10 +301,9 @@ class WebSocketTest(GoofyUITest):
   def CheckTestStatusChange(self, test_id, test_state):
     # The Goofy Server should receive the events in 2 seconds.
     for unused_t in range(20):
-      statuses = []
-      for event in self.events:
-        if event.type == Event.Type.STATE_CHANGE and event.path == test_id:
-          statuses.append(event.state['status'])
+      statuses = [event.state['status'] for event in self.events
+                  if event.type == _EVENT_TYPE_STATE_CHANGE and
+                  event.path == test_id]
       if statuses == [TestState.UNTESTED, TestState.ACTIVE, test_state]:
         return True
       time.sleep(0.1)
@@ -322,7 +329,7 @@ class WebSocketTest(GoofyUITest):
 
     hello_event = 0
     for event in self.events:
-      if event.type == Event.Type.HELLO:
+      if event.type == _EVENT_TYPE_HELLO:
         hello_event += 1
 
     # There should be one hello event
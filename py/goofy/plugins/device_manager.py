@@ -5,12 +5,15 @@
 
 """A plugin that shows device information on the UI."""
 
+import concurrent.futures
 import json
 import logging
 import os
 import re
 import subprocess
+import threading
 import time
+from xml.etree import ElementTree
 from xml.sax import saxutils
 
 from cros.factory.goofy.plugins import plugin
@@ -22,6 +25,24 @@ from cros.factory.utils import time_utils
 from cros.factory.utils import type_utils
 
 
+# Number of threads to collect device info with.  Most of the time is spent
+# waiting for the commands to finish, so this does not need to match the number
+# of CPUs.
+_DEVICE_INFO_MAX_WORKERS = 8
+# Shown in place of a value that crossystem failed to provide.
+_CROSSYSTEM_UNAVAILABLE = 'Not available.'
+# Matches the timestamp at the start of each line of dmesg.
+_DMESG_TIMESTAMP_RE = re.compile(r'^\[\s*([.\d]+)\]', re.MULTILINE)
+# Matches a line of crossystem output, like 'key = value  # description'.
+_CROSSYSTEM_LINE_RE = re.compile(r'(\S+)\s*=\s*(.*?)\s*#')
+
+
+@type_utils.CachedGetter
+def _GetLSBRelease():
+  """Returns /etc/lsb-release, which does not change until reboot."""
+  return file_utils.ReadFile('/etc/lsb-release')
+
+
 class DeviceManager(plugin.Plugin):
   """A Goofy plugin that supports a variety of debug information."""
 
@@ -50,7 +71,13 @@ class DeviceManager(plugin.Plugin):
 
   @staticmethod
   def _ReadUptime():
-    return open('/proc/uptime').read()
+    """Returns the system uptime in seconds."""
+    fd = os.open('/proc/uptime', os.O_RDONLY)
+    try:
+      data = os.read(fd, 64)
+    finally:
+      os.close(fd)
+    return float(data[:data.index(b' ')])
 
   def GetDmesg(self):
     """Returns the contents of dmesg.
@@ -59,17 +86,20 @@ class DeviceManager(plugin.Plugin):
     """
     dmesg = process_utils.Spawn(['dmesg'],
                                 check_call=True, read_stdout=True).stdout_data
-    uptime = float(self._ReadUptime().split()[0])
+    uptime = self._ReadUptime()
     boot_time = time.time() - uptime
-
-    def FormatTime(match):
-      return (time_utils.TimeString(boot_time + float(match.group(1))) + ' ' +
-              match.group(0))
+    # Insert the time before each line, and join the pieces once at the end.
+    pieces = []
+    start = 0
+    for match in _DMESG_TIMESTAMP_RE.finditer(dmesg):
+      pieces.append(dmesg[start:match.start()])
+      pieces.append(
+          time_utils.TimeString(boot_time + float(match.group(1))) + ' ')
+      start = match.start()
+    pieces.append(dmesg[start:])
 
     return plugin.MenuItem.ReturnData(
-        action=plugin.MenuItem.Action.SHOW_IN_DIALOG,
-        data=re.sub(r'^\[\s*([.\d]+)\]', FormatTime, dmesg,
-                    flags=re.MULTILINE))
+        action=plugin.MenuItem.Action.SHOW_IN_DIALOG, data=''.join(pieces))
 
   def ShowDeviceManagerWindow(self):
     return plugin.MenuItem.ReturnData(
@@ -130,46 +160,23 @@ class DeviceManager(plugin.Plugin):
         A string with XML format of the device node.
       """
 
-      def SplitMultilineToNodes(lines):
-        """Returns a XML format string to split lines of a output string.
-
-        Since HTML cannot identify '\n' automatically, we should split the
-        multiline output into multiple tags (one line is transformed into one
-        tag) so that the device manager can show it in multiline format.
-
-        Args:
-          lines: The multiline output to split.
-
-        Returns:
-          A string with XML format of the lines.
-        """
-        lines = lines.rstrip()
-
-        return ''.join(
-            '<line>%s</line>' % saxutils.escape(l) for l in lines.splitlines())
-
-      result = []
-      result.append('<node id=%s' % saxutils.quoteattr(node_id))
-      if not slow_command:
-        result.append('>')
-      else:
-        result.append(' slow_command=%s>' % saxutils.quoteattr(slow_command))
-
-      result.append(
-          '<description>%s</description>' % saxutils.escape(node_description))
+      node = ElementTree.Element('node', id=node_id)
+      if slow_command:
+        node.set('slow_command', slow_command)
+      ElementTree.SubElement(node, 'description').text = node_description
 
       for tag_name, tag_text, split_multiline in tag_list:
-        xml_tag_name = saxutils.escape(tag_name)
+        tag = ElementTree.SubElement(node, tag_name)
         if split_multiline:
-          xml_tag_text = SplitMultilineToNodes(tag_text)
+          # Since HTML cannot identify '\n' automatically, split the multiline
+          # output into multiple tags (one line is transformed into one tag) so
+          # that the device manager can show it in multiline format.
+          for line in tag_text.rstrip().splitlines():
+            ElementTree.SubElement(tag, 'line').text = line
         else:
-          xml_tag_text = saxutils.escape(tag_text)
-        result.append(
-            '<%s>%s</%s>' % (xml_tag_name, xml_tag_text, xml_tag_name))
-
-      result.append('</node>')
+          tag.text = tag_text
 
-      return ''.join(result)
+      return ElementTree.tostring(node, encoding='unicode')
 
     def SlowCommandDeviceNodeString(node_id, node_description, function_name):
       """Returns a XML string of a device which needs longer time to get info.
@@ -185,6 +192,32 @@ class DeviceManager(plugin.Plugin):
       return DeviceNodeString(
           node_id, node_description, [], slow_command=function_name)
 
+    crossystem_lock = threading.Lock()
+    crossystem_values = None
+
+    def GetCrossystemValues():
+      """Returns a dict of all crossystem values.
+
+      crossystem is only run once, however many nodes need its values.  Values
+      that crossystem fails to provide are missing from the dict.
+      """
+      nonlocal crossystem_values
+      with crossystem_lock:
+        if crossystem_values is None:
+          crossystem_values = {}
+          # crossystem exits with an error if it fails to read any value, but
+          # still prints the others.
+          try:
+            output = process_utils.SpawnOutput(['crossystem'])
+          except OSError:
+            logging.exception('Failed to run crossystem')
+            output = ''
+          for line in output.splitlines():
+            match = _CROSSYSTEM_LINE_RE.match(line)
+            if match:
+              crossystem_values[match.group(1)] = match.group(2)
+      return crossystem_values
+
     def GetBootDisk():
       """Returns boot disk info."""
       boot_device = process_utils.CheckOutput(['rootdev', '-s', '-d']).strip()
@@ -217,16 +250,16 @@ class DeviceManager(plugin.Plugin):
         tpm_root = legacy_tpm_root
       tpm_status = (open(os.path.join(tpm_root, 'enabled')).read(),
                     open(os.path.join(tpm_root, 'owned')).read())
-      tpm_stat = (
-          ('Enabled: %s\nOwned: %s\n' % tpm_status) +
-          process_utils.CheckOutput('crossystem | grep tpm_owner', shell=True))
+      tpm_stat = 'Enabled: %s\nOwned: %s\ntpm_owner = %s\n' % (
+          tpm_status[0], tpm_status[1],
+          GetCrossystemValues().get('tpm_owner', _CROSSYSTEM_UNAVAILABLE))
 
       return DeviceNodeString(
           'tpm', 'TPM status', [('status', tpm_stat, True)])
 
     def GetHWID():
       """Returns HWID."""
-      hwid = process_utils.CheckOutput(['crossystem', 'hwid'])
+      hwid = GetCrossystemValues().get('hwid', _CROSSYSTEM_UNAVAILABLE)
 
       return DeviceNodeString('hwid', 'HWID', [('hwid', hwid, False)])
 
@@ -247,16 +280,16 @@ class DeviceManager(plugin.Plugin):
 
     def GetVersion():
       """Returns EC/BIOS/Image version info."""
-      fw_version = (
-          process_utils.CheckOutput(['crossystem', 'fwid']) +
-          process_utils.CheckOutput(['crossystem', 'ro_fwid']))
+      values = GetCrossystemValues()
+      fw_version = '%s\n%s' % (values.get('fwid', _CROSSYSTEM_UNAVAILABLE),
+                                values.get('ro_fwid', _CROSSYSTEM_UNAVAILABLE))
 
       try:
         ec_version = process_utils.CheckOutput(['ectool', 'version'])
       except subprocess.CalledProcessError:
         ec_version = 'EC not available.'
 
-      image_version = ''.join(open('/etc/lsb-release', 'r').readlines())
+      image_version = _GetLSBRelease()
 
       return DeviceNodeString(
           'version', 'AP Firmware(BIOS)/EC/Image Version',
@@ -560,19 +593,36 @@ class DeviceManager(plugin.Plugin):
 
     # In first stage, we execute faster commands first.
     if reload_function_array is None:
-      # lshw provides common hardware information.
-      lshw_output = process_utils.CheckOutput(['lshw', '-xml'])
+      def GetFirmwareStatus():
+        # flashrom and ectool both access the EC and the SPI flash, so they
+        # must not run at the same time.
+        return GetWPStatus() + GetVersion()
+
+      # The read-only commands are independent and most of them just wait for a
+      # subprocess, so run them all at once.
+      with concurrent.futures.ThreadPoolExecutor(
+          max_workers=_DEVICE_INFO_MAX_WORKERS) as executor:
+
+        def Submit(*funcs):
+          return [executor.submit(func) for func in funcs]
+
+        # lshw provides common hardware information.
+        lshw_future = executor.submit(
+            process_utils.CheckOutput, ['lshw', '-xml'])
+        cros_futures = Submit(
+            GetBootDisk, GetTPMStatus, GetHWID, GetFirmwareStatus)
+        peripheral_futures = Submit(
+            GetTouchscreenFirmwareVersion, GetTouchpadFirmwareVersion,
+            GetTouchpadStatus, GetPanelHDMIStatus, GetModemStatus)
+
+      lshw_output = lshw_future.result()
       xml_lines = [line.strip() for line in lshw_output.splitlines()]
 
       # Use cros-specific commands to get cros info.
       cros_output = []
       cros_output.append('<node id="cros">')
       cros_output.append('<description>Chrome OS Specific</description>')
-      cros_output.append(GetBootDisk())
-      cros_output.append(GetTPMStatus())
-      cros_output.append(GetHWID())
-      cros_output.append(GetWPStatus())
-      cros_output.append(GetVersion())
+      cros_output.extend(future.result() for future in cros_futures)
       cros_output.append(
           SlowCommandDeviceNodeString('vpd', 'RO/RW VPD', 'GetVPD()'))
       cros_output.append('</node>')
@@ -583,11 +633,7 @@ class DeviceManager(plugin.Plugin):
       peripheral_output = []
       peripheral_output.append('<node id="peripheral">')
       peripheral_output.append('<description>Peripheral Devices</description>')
-      peripheral_output.append(GetTouchscreenFirmwareVersion())
-      peripheral_output.append(GetTouchpadFirmwareVersion())
-      peripheral_output.append(GetTouchpadStatus())
-      peripheral_output.append(GetPanelHDMIStatus())
-      peripheral_output.append(GetModemStatus())
+      peripheral_output.extend(future.result() for future in peripheral_futures)
       peripheral_output.append('</node>')
 
       xml_lines.insert(xml_lines.index('</list>'), ''.join(peripheral_output))
@@ -596,6 +642,8 @@ class DeviceManager(plugin.Plugin):
       system_usage = []
       system_usage.append('<node id="usage">')
       system_usage.append('<description>System Usage</description>')
+      # Sample the usage only after the other commands are done, so that it
+      # does not include their load.
       system_usage.append(GetCPUUsage())
       system_usage.append(
           SlowCommandDeviceNodeString(
@@ -3,6 +3,7 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+import json
 import unittest
 from unittest import mock
 
@@ -29,24 +30,44 @@ class DeviceManagerTest(unittest.TestCase):
     data = self.dm.GetVarLogMessagesBeforeReboot()
     self.assertEqual(var_log_messages, data.data)
 
-  @mock.patch.multiple('cros.factory.goofy.plugins.device_manager',
-                       process_utils=mock.DEFAULT,
-                       time=mock.DEFAULT)
-  def testGetDmesg(self, process_utils, time):
-    # pylint: disable=protected-access
-    device_manager.DeviceManager._ReadUptime = mock.Mock()
-
+  @mock.patch('cros.factory.goofy.plugins.device_manager.process_utils')
+  @mock.patch('cros.factory.goofy.plugins.device_manager.time')
+  @mock.patch.object(device_manager.DeviceManager, '_ReadUptime',
+                     return_value=3000.0)
+  def testGetDmesg(self, unused_read_uptime, time, process_utils):
     process_utils.Spawn.return_value = type(
-        '', (object,), dict(stdout_data='[ 123.0] A\n[2345.0] B\n'))
-    device_manager.DeviceManager._ReadUptime.return_value = '3000.0'
+        '', (object,), dict(stdout_data='[ 123.0] A\nfoo\n[2345.0] B\n'))
     time.time.return_value = 1343806777.0
 
     self.assertEqual('2012-08-01T06:51:40.000Z [ 123.0] A\n'
+                     'foo\n'
                      '2012-08-01T07:28:42.000Z [2345.0] B\n',
                      self.dm.GetDmesg().data)
     process_utils.Spawn.assert_called_once_with(
         ['dmesg'], check_call=True, read_stdout=True)
 
+  @mock.patch('cros.factory.goofy.plugins.device_manager.process_utils')
+  def testGetHWIDFromCrossystem(self, process_utils):
+    process_utils.SpawnOutput.return_value = (
+        'hwid                    = FOO A2B-C3D  # [RO/str] Hardware ID # x\n'
+        'fwid                    = (error)      # [RO/str] Active firmware ID\n')
+    self.assertEqual(
+        ['<node id="hwid"><description>HWID</description>'
+         '<hwid>FOO A2B-C3D</hwid></node>'] * 2,
+        json.loads(self.dm.GetDeviceInfo('["GetHWID()", "GetHWID()"]')))
+    process_utils.SpawnOutput.assert_called_once_with(['crossystem'])
+
+    process_utils.SpawnOutput.return_value = ''
+    self.assertEqual(
+        ['<node id="hwid"><description>HWID</description>'
+         '<hwid>Not available.</hwid></node>'],
+        json.loads(self.dm.GetDeviceInfo('["GetHWID()"]')))
+
+  def testReadUptime(self):
+    # pylint: disable=protected-access
+    with mock.patch('os.read', return_value=b'123.45 678.90\n'):
+      self.assertEqual(123.45, device_manager.DeviceManager._ReadUptime())
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -36,94 +36,279 @@ import logging
 import os
 import pickle
 import queue
+import struct
 import subprocess
+import sys
+import threading
+import time
 
 from cros.factory.test.env import paths
 from cros.factory.utils import process_utils
 
 
 NUM_PRESPAWNED_PROCESSES = 1
+NUM_PRESPAWNED_PYTEST_PROCESSES = 3
 PYTEST_PRESPAWNER_PATH = os.path.join(paths.FACTORY_DIR,
                                       'py/test/pytest_runner.py')
 
+# Messages to the prespawned processes are pickled objects prefixed with their
+# length, so a process can read a whole message without waiting for EOF.  A
+# zero-length message tells the process to exit.
+_MESSAGE_HEADER = struct.Struct('<I')
+# Written by a prespawned process to the file descriptor in _READY_FD_ENV once
+# it is ready for its message.  A dedicated pipe is used, so the handshake does
+# not consume any of the process's own output.
+_READY_MARK = b'R'
+_READY_FD_ENV = 'CROS_FACTORY_PRESPAWNER_READY_FD'
+
+
+def WriteMessage(stream, obj):
+  """Writes a message to a prespawned process.
+
+  Args:
+    stream: A binary file object, usually the stdin of the process.
+    obj: The object to send, or None to ask the process to exit.
+  """
+  # Goofy and the prespawned processes always run the same Python, so the
+  # most compact protocol is safe to use.
+  payload = b'' if obj is None else pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+  stream.write(_MESSAGE_HEADER.pack(len(payload)) + payload)
+  stream.flush()
+
+
+def ReadMessage(stream):
+  """Reads a message written by WriteMessage.
+
+  Args:
+    stream: A binary file object, usually sys.stdin.buffer.
+
+  Returns:
+    The object sent, or None if the process is asked to exit or the stream is
+    closed.
+  """
+  header = stream.read(_MESSAGE_HEADER.size)
+  if len(header) < _MESSAGE_HEADER.size:
+    return None
+  length, = _MESSAGE_HEADER.unpack(header)
+  if not length:
+    return None
+  payload = stream.read(length)
+  if len(payload) < length:
+    return None
+  return pickle.loads(payload)
+
+
+def NotifyReady():
+  """Tells the prespawner that this process is ready for its message.
+
+  Prespawned processes of a Prespawner created with wait_ready=True must call
+  this once they have finished their imports, before ReadMessage.  Does nothing
+  if the prespawner does not wait for the process.
+  """
+  ready_fd = os.environ.pop(_READY_FD_ENV, None)
+  if ready_fd is None:
+    return
+  ready_fd = int(ready_fd)
+  try:
+    os.write(ready_fd, _READY_MARK)
+  finally:
+    os.close(ready_fd)
+
+
+def UpdateEnviron(env):
+  """Applies the environment changes sent to a prespawned process.
+
+  Args:
+    env: A dict of environment variables to set in os.environ.  Variables with
+      None values are removed.
+  """
+  for key, value in env.items():
+    if value is None:
+      os.environ.pop(key, None)
+    else:
+      os.environ[key] = value
+
 
 class Prespawner:
 
-  def __init__(self, prespawner_path, prespawner_args, pipe_stdout=False):
-    self.prespawned = queue.Queue(NUM_PRESPAWNED_PROCESSES)
-    self.thread = None
+  def __init__(self, prespawner_path, prespawner_args, pipe_stdout=False,
+               pool_size=NUM_PRESPAWNED_PROCESSES, wait_ready=False):
+    """Constructor.
+
+    Args:
+      prespawner_path: Path of the script to run in the prespawned processes.
+      prespawner_args: A list of extra arguments to the script.
+      pipe_stdout: Whether to pipe stdout and stderr of the processes.
+      pool_size: Number of processes to keep prespawned.
+      wait_ready: Whether to wait for the processes to call NotifyReady before
+        putting them in the pool.
+    """
+    assert pool_size > 0
+    self.pool_size = pool_size
+    # Prespawn threads take a slot before spawning a process, and spawn()
+    # gives it back when it takes the process, so there are never more than
+    # pool_size processes prespawned.
+    self.slots = threading.Semaphore(pool_size)
+    self.prespawned = queue.SimpleQueue()
+    self.threads = []
     self.terminated = False
     self.prespawner_path = prespawner_path
+    self.prespawner_cwd = os.path.dirname(prespawner_path)
     assert isinstance(prespawner_args, list)
     self.prespawner_args = prespawner_args
     self.pipe_stdout = pipe_stdout
+    self.wait_ready = wait_ready
 
   def spawn(self, args, env_additions=None):
     """Spawns a new process (reusing an prespawned process if available).
 
+    Only the difference between the current environment and the environment
+    the process was prespawned with is sent to the process, which applies it
+    with UpdateEnviron.
+
+    Prespawned processes which have already exited are discarded.  If every
+    process taken from the pool has exited, e.g. when the processes fail to
+    start, the last one is returned without sending it the message, so the
+    caller still sees its output and exit code.
+
     @param args: A list of arguments (sys.argv)
     @param env_additions: Items to add to the current environment
     """
-    new_env = dict(os.environ)
+    process = None
+    for unused_i in range(self.pool_size):
+      if process:
+        logging.warning('Prespawned process %d exited with code %d, discarded',
+                        process.pid, process.returncode)
+        process.stdin.close()
+        if process.stdout:
+          process.stdout.close()
+      process = self.prespawned.get()
+      self.slots.release()
+      if process.poll() is None:
+        break
+    else:
+      logging.warning('All prespawned processes exited, the last one exited '
+                      'with code %d', process.returncode)
+      process.stdin.close()
+      return process
+
+    prespawned_environ = process.prespawned_environ
+    env_changes = {key: value for key, value in os.environ.items()
+                   if prespawned_environ.get(key) != value}
+    env_changes.update((key, None) for key in prespawned_environ
+                       if key not in os.environ)
     if env_additions:
-      new_env.update(env_additions)
+      env_changes.update(env_additions)
 
-    process = self.prespawned.get()
-    # Write the environment and argv to the process's stdin; it will launch
-    # test once these are received.
-    pickle.dump((new_env, args), process.stdin)
+    # Write the environment changes and argv to the process's stdin; it will
+    # launch test once these are received.
+    WriteMessage(process.stdin, (env_changes, args))
     process.stdin.close()
     return process
 
   def start(self):
-    """Starts a thread to pre-spawn pytests.
+    """Starts threads to pre-spawn pytests.
+
+    Up to one thread per CPU is started, so a drained pool is refilled in
+    parallel.
     """
+    if self.pipe_stdout:
+      pipe_stdout_args = {'stdout': subprocess.PIPE,
+                          'stderr': subprocess.STDOUT}
+    else:
+      pipe_stdout_args = {}
+    # Use the absolute path of the interpreter so exec does not search PATH.
+    # Without preexec_fn, subprocess creates the child with vfork, so spawning
+    # does not slow down as Goofy's memory grows.
+    command = ([sys.executable, '-u', self.prespawner_path] +
+               self.prespawner_args)
+
     def run():
-      while not self.terminated:
-        if self.pipe_stdout:
-          pipe_stdout_args = {'stdout': subprocess.PIPE,
-                              'stderr': subprocess.STDOUT}
-        else:
-          pipe_stdout_args = {}
-
-        process = process_utils.Spawn(
-            ['python3', '-u', self.prespawner_path] + self.prespawner_args,
-            cwd=os.path.dirname(self.prespawner_path),
-            stdin=subprocess.PIPE,
-            encoding=None,
-            **pipe_stdout_args)
-        logging.debug('Pre-spawned a test process %d', process.pid)
+      while True:
+        self.slots.acquire()
+        if self.terminated:
+          break
+        start_time = time.time()
+        environ = dict(os.environ)
+        process_environ = environ
+        pass_fds = ()
+        if self.wait_ready:
+          ready_read_fd, ready_write_fd = os.pipe()
+          process_environ = dict(environ,
+                                 **{_READY_FD_ENV: str(ready_write_fd)})
+          pass_fds = (ready_write_fd,)
+        try:
+          process = process_utils.Spawn(
+              command,
+              cwd=self.prespawner_cwd,
+              stdin=subprocess.PIPE,
+              env=process_environ,
+              encoding=None,
+              pass_fds=pass_fds,
+              **pipe_stdout_args)
+        finally:
+          if self.wait_ready:
+            os.close(ready_write_fd)
+        if self.wait_ready:
+          try:
+            # Returns with no data if the process exits before it is ready.
+            ready = os.read(ready_read_fd, len(_READY_MARK)) == _READY_MARK
+          finally:
+            os.close(ready_read_fd)
+          if not ready:
+            # Still put it in the pool.  spawn() discards it, unless the whole
+            # pool has failed, in which case its output reaches the test.
+            logging.warning('Prespawned process %d failed to get ready',
+                            process.pid)
+        process.prespawned_environ = environ
+        logging.debug('Pre-spawned a test process %d in %.3f seconds',
+                      process.pid, time.time() - start_time)
         self.prespawned.put(process)
 
-      # Let stop() know that we are done
+      # Let stop() know that this thread is done
       self.prespawned.put(None)
 
-    if not self.thread and os.path.exists(self.prespawner_path):
-      self.thread = process_utils.StartDaemonThread(
-          target=run, name='Prespawner')
+    if not self.threads and os.path.exists(self.prespawner_path):
+      num_threads = min(self.pool_size, os.cpu_count() or 1)
+      self.threads = [
+          process_utils.StartDaemonThread(
+              target=run, name='Prespawner-%d' % i)
+          for i in range(num_threads)]
 
   def stop(self):
-    """Stops the pre-spawn thread gracefully.
+    """Stops the pre-spawn threads gracefully.
     """
     self.terminated = True
-    if self.thread:
-      # Wait for any existing prespawned processes.
-      while True:
+    if self.threads:
+      # Wake up the threads waiting for a slot.
+      num_running_threads = len(self.threads)
+      self.slots.release(num_running_threads)
+      # Collect any existing prespawned processes, until every thread is done.
+      # Tell each process to exit as soon as it is collected, and wait for all
+      # of them afterwards, so they shut down in parallel.
+      processes = []
+      while num_running_threads:
         process = self.prespawned.get()
         if not process:
-          break
+          num_running_threads -= 1
+          continue
         if process.poll() is None:
-          # Send a 'None' environment and arg list to tell the prespawner
-          # processes to exit.
-          pickle.dump((None, None), process.stdin)
-          process.stdin.close()
-          process.wait()
-      self.thread.join()
-      self.thread = None
+          # Send an empty message to tell the prespawner processes to exit.
+          WriteMessage(process.stdin, None)
+        process.stdin.close()
+        processes.append(process)
+      for process in processes:
+        process.wait()
+        if process.stdout:
+          process.stdout.close()
+      for thread in self.threads:
+        thread.join()
+      self.threads = []
 
 
 class PytestPrespawner(Prespawner):
 
-  def __init__(self):
+  def __init__(self, pool_size=NUM_PRESPAWNED_PYTEST_PROCESSES):
     super(PytestPrespawner, self).__init__(
-        PYTEST_PRESPAWNER_PATH, [], pipe_stdout=True)
+        PYTEST_PRESPAWNER_PATH, [], pipe_stdout=True, pool_size=pool_size,
+        wait_ready=True)
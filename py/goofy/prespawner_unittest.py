@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# Copyright 2022 The Chromium OS Authors. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from cros.factory.goofy import prespawner
+from cros.factory.test.env import paths
+from cros.factory.utils import file_utils
+
+
+_CHILD_SCRIPT = """
+import os
+import sys
+
+sys.path.insert(0, %r)
+from cros.factory.goofy import prespawner
+
+prespawner.NotifyReady()
+message = prespawner.ReadMessage(sys.stdin.buffer)
+if not message:
+  sys.exit(0)
+env, args = message
+prespawner.UpdateEnviron(env)
+print(os.environ['PRESPAWNER_UNITTEST'],
+      os.environ.get('PRESPAWNER_UNITTEST_REMOVED'), ' '.join(args))
+"""
+
+_EXITING_CHILD_SCRIPT = """
+import sys
+
+print('failed to start')
+sys.exit(3)
+"""
+
+
+class MessageTest(unittest.TestCase):
+
+  def testReadWrite(self):
+    stream = io.BytesIO()
+    prespawner.WriteMessage(stream, ({'a': 'b'}, ['c']))
+    prespawner.WriteMessage(stream, None)
+    stream.seek(0)
+    self.assertEqual(({'a': 'b'}, ['c']), prespawner.ReadMessage(stream))
+    self.assertIsNone(prespawner.ReadMessage(stream))
+    # End of stream.
+    self.assertIsNone(prespawner.ReadMessage(stream))
+
+  def testReadWriteLargeMessage(self):
+    stream = io.BytesIO()
+    # Larger than the default pipe buffer.
+    env = {'KEY%d' % i: '%0100d' % i for i in range(1000)}
+    prespawner.WriteMessage(stream, (env, ['c']))
+    stream.seek(0)
+    self.assertEqual((env, ['c']), prespawner.ReadMessage(stream))
+
+
+class PrespawnerTest(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    script_path = os.path.join(self.temp_dir, 'child.py')
+    file_utils.WriteFile(
+        script_path,
+        _CHILD_SCRIPT % os.path.dirname(
+            os.path.dirname(paths.FACTORY_PYTHON_PACKAGE_DIR)))
+    self.environ_patcher = mock.patch.dict(
+        os.environ, {'PRESPAWNER_UNITTEST_REMOVED': 'baz'})
+    self.environ_patcher.start()
+    self.prespawner = prespawner.Prespawner(
+        script_path, [], pipe_stdout=True, pool_size=2, wait_ready=True)
+    self.prespawner.start()
+
+  def tearDown(self):
+    self.prespawner.stop()
+    self.environ_patcher.stop()
+    shutil.rmtree(self.temp_dir)
+
+  def _Spawn(self, args, env_additions=None):
+    process = self.prespawner.spawn(args, env_additions)
+    with process.stdout:
+      output = process.stdout.read()
+    process.wait()
+    self.assertEqual(0, process.returncode)
+    return output
+
+  def testSpawn(self):
+    for i in range(3):
+      self.assertEqual(
+          b'bar baz foo %d\n' % i,
+          self._Spawn(['foo', str(i)], {'PRESPAWNER_UNITTEST': 'bar'}))
+
+  def testSpawnWithChangedEnviron(self):
+    os.environ['PRESPAWNER_UNITTEST'] = 'qux'
+    del os.environ['PRESPAWNER_UNITTEST_REMOVED']
+    self.assertEqual(b'qux None foo\n', self._Spawn(['foo']))
+
+  def testSpawnSkipsExitedProcess(self):
+    process = self.prespawner.prespawned.get()
+    process.kill()
+    process.wait()
+    self.prespawner.prespawned.put(process)
+    # Other processes may be queued before the killed one.
+    for unused_i in range(self.prespawner.pool_size):
+      self.assertEqual(b'bar baz foo\n',
+                       self._Spawn(['foo'], {'PRESPAWNER_UNITTEST': 'bar'}))
+
+
+class ExitedPrespawnerTest(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+    script_path = os.path.join(self.temp_dir, 'child.py')
+    file_utils.WriteFile(script_path, _EXITING_CHILD_SCRIPT)
+    self.prespawner = prespawner.Prespawner(
+        script_path, [], pipe_stdout=True, pool_size=2, wait_ready=True)
+    self.prespawner.start()
+
+  def tearDown(self):
+    self.prespawner.stop()
+    shutil.rmtree(self.temp_dir)
+
+  def testSpawnWhenAllProcessesExited(self):
+    # Wait until the whole pool is prespawned and has exited.
+    processes = [self.prespawner.prespawned.get() for unused_i in range(2)]
+    for process in processes:
+      process.wait()
+      self.prespawner.prespawned.put(process)
+
+    # Do not refill the pool, so every process spawn() takes has exited.
+    with mock.patch.object(self.prespawner.slots, 'release'):
+      process = self.prespawner.spawn(['foo'])
+    with process.stdout:
+      output = process.stdout.read()
+    process.wait()
+    # The whole output of the last exited process reaches the caller, even
+    # though it never became ready.
+    self.assertEqual(b'failed to start\n', output)
+    self.assertEqual(3, process.returncode)
+
+
+if __name__ == '__main__':
+  unittest.main()
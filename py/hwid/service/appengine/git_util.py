@@ -3,12 +3,13 @@
 # found in the LICENSE file.
 
 import contextlib
-import datetime
 import enum
+import functools
 import hashlib
 import http.client
 import logging
 import os
+import ssl
 import time
 from typing import List, NamedTuple, Optional
 import urllib.parse
@@ -45,6 +46,16 @@ def _B(s):
   return s if isinstance(s, bytes) else s.encode()
 
 
+@functools.lru_cache(maxsize=None)
+def _GetSSLContext():
+  """Returns an SSL context trusting the certifi CA bundle.
+
+  The context is shared by all pool managers so the CA bundle is parsed once
+  per process instead of once per connection.
+  """
+  return ssl.create_default_context(cafile=certifi.where())
+
+
 class GitUtilException(Exception):
   pass
 
@@ -121,7 +132,7 @@ class MemoryRepo(_MemoryRepo):
 
     parsed = urllib.parse.urlparse(remote_location)
 
-    pool_manager = PoolManager(ca_certs=certifi.where())
+    pool_manager = PoolManager(ssl_context=_GetSSLContext())
     pool_manager.headers['Cookie'] = self.auth_cookie
     # Suppress ResourceWarning
     pool_manager.headers['Connection'] = 'close'
@@ -132,8 +143,9 @@ class MemoryRepo(_MemoryRepo):
         parsed.path, self, determine_wants=lambda mapping:
         [mapping[REF_HEADS_PREFIX + _B(branch)]], depth=1)
     stripped_refs = strip_peeled_refs(fetch_result.refs)
+    prefix_len = len(REF_HEADS_PREFIX)
     branches = {
-        n[len(REF_HEADS_PREFIX):]: v
+        n[prefix_len:]: v
         for (n, v) in stripped_refs.items()
         if n.startswith(REF_HEADS_PREFIX)
     }
@@ -141,44 +153,50 @@ class MemoryRepo(_MemoryRepo):
     self[HEAD] = self[REF_REMOTES_PREFIX + DEFAULT_REMOTE_NAME + b'/' +
                       _B(branch)]
 
-  def recursively_add_file(self, cur, path_splits, file_name, mode, blob):
-    """Add files in object store.
+  def _add_file(self, trees, path_splits, file_name, mode, blob):
+    """Add a file in object store.
 
-    Since we need to collect all tree objects with modified children, a
-    recursively approach is applied
+    The trees on the path of the file are collected in `trees` instead of
+    being stored right away, so a directory shared by several new files is
+    loaded and stored only once.  See `add_files`.
 
     Args:
-      cur: Current tree obj
-      path_splits: Directories between cur and file
+      trees: Dict mapping path tuples to the modified tree objects
+      path_splits: Directories between the root tree and file
       file_name: File name
       mode: File mode in git
       blob: Blob obj of the file
     """
 
-    if path_splits:
-      child_name = path_splits[0]
-      if child_name in cur:
-        unused_mode, sha = cur[child_name]
-        sub = self[sha]
-        if not isinstance(sub, Tree):  # if child_name exists but not a dir
-          raise GitUtilException
-      else:
-        # not exists, create a new tree
-        sub = Tree()
-      self.recursively_add_file(sub, path_splits[1:], file_name, mode, blob)
-      cur.add(child_name, DIR_MODE, sub.id)
-    else:
-      # reach the directory of the target file
-      if file_name in cur:
-        unused_mod, sha = cur[file_name]
-        existed_obj = self[sha]
-        if not isinstance(existed_obj, Blob):
-          # if file_name exists but not a Blob(file)
-          raise GitUtilException
-      self.object_store.add_object(blob)
-      cur.add(file_name, mode, blob.id)
-
-    self.object_store.add_object(cur)
+    path = ()
+    cur = trees[path]
+    for child_name in path_splits:
+      path += (child_name, )
+      sub = trees.get(path)
+      if sub is None:
+        if child_name in cur:
+          unused_mode, sha = cur[child_name]
+          sub = self[sha]
+          if not isinstance(sub, Tree):  # if child_name exists but not a dir
+            raise GitUtilException
+        else:
+          # not exists, create a new tree
+          sub = Tree()
+        trees[path] = sub
+      cur = sub
+
+    # reach the directory of the target file
+    if path + (file_name, ) in trees:
+      # file_name is a directory added by a previous file
+      raise GitUtilException
+    if file_name in cur:
+      unused_mod, sha = cur[file_name]
+      existed_obj = self[sha]
+      if not isinstance(existed_obj, Blob):
+        # if file_name exists but not a Blob(file)
+        raise GitUtilException
+    self.object_store.add_object(blob)
+    cur.add(file_name, mode, blob.id)
 
   def add_files(self, new_files, tree=None):
     """Add files to repository.
@@ -193,18 +211,26 @@ class MemoryRepo(_MemoryRepo):
     if tree is None:
       head_commit = self[HEAD]
       tree = self[head_commit.tree]
+    trees = {(): tree}
     for (file_path, mode, content) in new_files:
       path, filename = os.path.split(file_path)
       # os.path.normpath('') returns '.' which is unexpected
-      paths = [
-          _B(x) for x in os.path.normpath(path).split(os.sep) if x and x != '.'
-      ]
+      paths = tuple(
+          _B(x) for x in os.path.normpath(path).split(os.sep) if x and x != '.')
       try:
-        self.recursively_add_file(tree, paths, _B(filename), mode,
-                                  Blob.from_string(_B(content)))
+        self._add_file(trees, paths, _B(filename), mode,
+                       Blob.from_string(_B(content)))
       except GitUtilException:
         raise GitUtilException('Invalid filepath %r' % file_path)
 
+    # Store the modified trees from the deepest one so that every parent tree
+    # refers to the final ids of its subtrees.
+    for path in sorted(trees, key=len, reverse=True):
+      sub = trees[path]
+      if path:
+        trees[path[:-1]].add(path[-1], DIR_MODE, sub.id)
+      self.object_store.add_object(sub)
+
     return tree
 
   def list_files(self, path):
@@ -251,18 +277,13 @@ def _GetChangeId(tree_id, parent_commit, author, committer, commit_msg):
     hash of information as change id
   """
 
-  now = int(time.mktime(datetime.datetime.now().timetuple()))
-  change_msg = ('tree {tree_id}\n'
-                'parent {parent_commit}\n'
-                'author {author} {now}\n'
-                'committer {committer} {now}\n'
-                '\n'
-                '{commit_msg}').format(
-                    tree_id=tree_id, parent_commit=parent_commit, author=author,
-                    committer=committer, now=now, commit_msg=commit_msg)
-  change_id_input = 'commit {size}\x00{change_msg}'.format(
-      size=len(change_msg), change_msg=change_msg)
-  return 'I{}'.format(hashlib.sha1(change_id_input.encode('utf-8')).hexdigest())
+  now = int(time.time())
+  change_msg = b'tree %s\nparent %s\nauthor %s %d\ncommitter %s %d\n\n%s' % (
+      _B(tree_id), _B(parent_commit), _B(author), now, _B(committer), now,
+      _B(commit_msg))
+  change_id_hash = hashlib.sha1(b'commit %d\x00' % len(change_msg))
+  change_id_hash.update(change_msg)
+  return 'I' + change_id_hash.hexdigest()
 
 
 def CreateCL(git_url, auth_cookie, branch, new_files, author, committer,
@@ -307,7 +328,7 @@ def CreateCL(git_url, auth_cookie, branch, new_files, author, committer,
   if notification:
     target_branch += b'%' + b','.join(notification)
 
-  pool_manager = PoolManager(ca_certs=certifi.where())
+  pool_manager = PoolManager(ssl_context=_GetSSLContext())
   pool_manager.headers['Cookie'] = repo.auth_cookie
   porcelain.push(repo, git_url, HEAD + b':' + target_branch,
                  pool_manager=pool_manager)
@@ -328,7 +349,7 @@ def GetCurrentBranch(git_url_prefix, project, auth_cookie=''):
   git_url = '{git_url_prefix}/projects/{project}/HEAD'.format(
       git_url_prefix=git_url_prefix, project=urllib.parse.quote(
           project, safe=''))
-  pool_manager = PoolManager(ca_certs=certifi.where())
+  pool_manager = PoolManager(ssl_context=_GetSSLContext())
   pool_manager.headers['Cookie'] = auth_cookie
   pool_manager.headers['Content-Type'] = 'application/json'
   # Suppress ResourceWarning
@@ -370,7 +391,7 @@ def GetCommitId(git_url_prefix, project, branch=None, auth_cookie=''):
   git_url = '{git_url_prefix}/projects/{project}/branches/{branch}'.format(
       git_url_prefix=git_url_prefix, project=urllib.parse.quote(
           project, safe=''), branch=urllib.parse.quote(branch, safe=''))
-  pool_manager = PoolManager(ca_certs=certifi.where())
+  pool_manager = PoolManager(ssl_context=_GetSSLContext())
   pool_manager.headers['Cookie'] = auth_cookie
   pool_manager.headers['Content-Type'] = 'application/json'
   # Suppress ResourceWarning
@@ -450,7 +471,7 @@ def GetCLInfo(review_host, change_id, auth_cookie='', include_messages=False,
     params.append(('o', 'DETAILED_ACCOUNTS'))
   if params:
     url = url + '?' + urllib.parse.urlencode(params)
-  pool_manager = PoolManager(ca_certs=certifi.where())
+  pool_manager = PoolManager(ssl_context=_GetSSLContext())
   pool_manager.headers['Cookie'] = auth_cookie
   pool_manager.headers['Content-Type'] = 'application/json'
   pool_manager.headers['Connection'] = 'close'
@@ -496,7 +517,7 @@ def AbandonCL(review_host, auth_cookie, change_id):
   git_url = '{review_host}/a/changes/{change_id}/abandon'.format(
       review_host=review_host, change_id=change_id)
 
-  pool_manager = PoolManager(ca_certs=certifi.where())
+  pool_manager = PoolManager(ssl_context=_GetSSLContext())
   pool_manager.headers['Cookie'] = auth_cookie
   fp = pool_manager.urlopen(method='POST', url=git_url)
   if fp.status != http.client.OK:
@@ -4,7 +4,6 @@
 # found in the LICENSE file.
 """Tests for cros.factory.hwid.service.appengine.git_util"""
 
-import datetime
 import hashlib
 import http.client
 import os.path
@@ -49,12 +48,29 @@ class GitUtilTest(unittest.TestCase):
     self.assertEqual(mode3, 0o100644)
     self.assertEqual(repo[sha3].data, b'content of a/b/e/f')
 
-  @mock.patch('cros.factory.hwid.service.appengine.git_util.datetime')
-  def testGetChangeId(self, datetime_mock):
+  def testAddFilesToExistingTree(self):
+    repo = git_util.MemoryRepo('')
+    tree = repo.add_files([
+        ('a/b/c', 0o100644, b'content of a/b/c'),
+        ('a/d', 0o100644, b'content of a/d'),
+    ], Tree())
+    tree = repo.add_files([
+        ('a/b/c', 0o100644, b'new content of a/b/c'),
+        ('a/b/e', 0o100644, b'content of a/b/e'),
+    ], tree)
+    tree.check()
+
+    for path, content in [(b'a/b/c', b'new content of a/b/c'),
+                          (b'a/b/e', b'content of a/b/e'),
+                          (b'a/d', b'content of a/d')]:
+      unused_mode, sha = tree.lookup_path(repo.get_object, path)
+      self.assertEqual(repo[sha].data, content)
+
+  @mock.patch('cros.factory.hwid.service.appengine.git_util.time.time',
+              return_value=1556616237.5)
+  def testGetChangeId(self, unused_time_mock):
     """Reference result of expected implementation."""
 
-    datetime_mock.datetime.now.return_value = datetime.datetime.fromtimestamp(
-        1556616237)
     tree_id = '4e7b52cf7c0b196914c924114c7225333f549bf1'
     parent = '3ef27b7a56e149a7cc64aaf1af837248daac514e'
     author = 'change-id test <change-id-test@google.com>'
@@ -65,6 +81,21 @@ class GitUtilTest(unittest.TestCase):
                                       commit_msg)
     self.assertEqual(change_id, expected_change_id)
 
+  @mock.patch('cros.factory.hwid.service.appengine.git_util.time.time',
+              return_value=1556616237.5)
+  def testGetChangeIdWithBytesIds(self, unused_time_mock):
+    """Tree and parent ids from dulwich are bytes and hashed as raw values."""
+
+    tree_id = b'4e7b52cf7c0b196914c924114c7225333f549bf1'
+    parent = b'3ef27b7a56e149a7cc64aaf1af837248daac514e'
+    author = 'change-id test <change-id-test@google.com>'
+    committer = 'change-id test <change-id-test@google.com>'
+    commit_msg = 'Change Id test'
+    expected_change_id = 'I3b5a06d980966aaa3d981ecb4d578f0cc1dd8179'
+    change_id = git_util._GetChangeId(tree_id, parent, author, committer,
+                                      commit_msg)
+    self.assertEqual(change_id, expected_change_id)
+
   def testInvalidFileStructure1(self):
     new_files = [
         ('a/b/c', 0o100644, b'content of a/b/c'),
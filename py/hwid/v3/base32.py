@@ -6,6 +6,7 @@
 """Implementation of base32 utilities."""
 
 import argparse
+import functools
 from zlib import crc32
 
 from cros.factory.hwid.v3 import common
@@ -25,6 +26,8 @@ class Base32:
   DASH_INSERTION_WIDTH = 4
   CHECKSUM_SIZE = 10
   ENCODED_CHECKSUM_SIZE = 2
+  CHECKSUM_MASK = (1 << CHECKSUM_SIZE) - 1
+  BASE32_MASK = (1 << BASE32_BIT_WIDTH) - 1
 
   @classmethod
   def GetPaddingLength(cls, orig_length):
@@ -39,6 +42,7 @@ class Base32:
     return (cls.BASE32_BIT_WIDTH - orig_length) % cls.BASE32_BIT_WIDTH
 
   @classmethod
+  @functools.lru_cache(maxsize=128)
   def Encode(cls, binary_string):
     """Converts the given binary string to a base32-encoded string. Add paddings
     if necessary.
@@ -72,6 +76,7 @@ class Base32:
     return ''.join(result)
 
   @classmethod
+  @functools.lru_cache(maxsize=128)
   def Checksum(cls, string):
     """Calculate a 10-bit checksum for the given string.
 
@@ -83,9 +88,9 @@ class Base32:
       10-bit checksum.
     """
     # Get the last 10 bits
-    c = crc32(string.encode('utf-8')) & (2 ** 10 - 1)
+    c = crc32(string.encode('utf-8')) & cls.CHECKSUM_MASK
     return (cls.BASE32_ALPHABET[c >> cls.BASE32_BIT_WIDTH] +
-            cls.BASE32_ALPHABET[c & (2 ** cls.BASE32_BIT_WIDTH - 1)])
+            cls.BASE32_ALPHABET[c & cls.BASE32_MASK])
 
 
 if __name__ == '__main__':
@@ -6,6 +6,7 @@
 """Implementation of base8192 utilities."""
 
 import argparse
+import functools
 from zlib import crc32
 
 from cros.factory.hwid.v3 import common
@@ -31,6 +32,8 @@ class Base8192:
   DASH_INSERTION_WIDTH = 3
   CHECKSUM_SIZE = 8
   ENCODED_CHECKSUM_SIZE = 2
+  CHECKSUM_MASK = (1 << CHECKSUM_SIZE) - 1
+  BASE32_MASK = (1 << BASE32_BIT_WIDTH) - 1
 
   @classmethod
   def GetPaddingLength(cls, orig_length):
@@ -45,6 +48,7 @@ class Base8192:
     return (cls.BASE32_BIT_WIDTH - orig_length) % cls.BASE8192_BIT_WIDTH
 
   @classmethod
+  @functools.lru_cache(maxsize=128)
   def Encode(cls, binary_string):
     """Converts the given binary string to a base8192-encoded string. Add
     paddings if necessary.
@@ -110,6 +114,7 @@ class Base8192:
     return ''.join(result)
 
   @classmethod
+  @functools.lru_cache(maxsize=128)
   def Checksum(cls, string):
     """Calculate a 8-bit checksum for the given string.
 
@@ -121,9 +126,9 @@ class Base8192:
       representing the 8-bit checksum.
     """
     # Get the last 8 bits
-    c = crc32(string.encode('utf-8')) & (2 ** 8 - 1)
+    c = crc32(string.encode('utf-8')) & cls.CHECKSUM_MASK
     return (cls.BASE8_ALPHABET[c >> cls.BASE32_BIT_WIDTH] +
-            cls.BASE32_ALPHABET[c & (2 ** cls.BASE32_BIT_WIDTH - 1)])
+            cls.BASE32_ALPHABET[c & cls.BASE32_MASK])
 
 
 if __name__ == '__main__':
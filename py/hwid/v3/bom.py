@@ -41,6 +41,8 @@ class BOM:
         component name.
   """
 
+  __slots__ = ('encoding_pattern_index', 'image_id', 'components')
+
   def __init__(self, encoding_pattern_index, image_id, components):
     self.encoding_pattern_index = encoding_pattern_index
     self.image_id = image_id
@@ -58,7 +60,9 @@ class BOM:
   def __eq__(self, op2):
     if not isinstance(op2, BOM):
       return False
-    return self.__dict__ == op2.__dict__
+    return (self.encoding_pattern_index == op2.encoding_pattern_index and
+            self.image_id == op2.image_id and
+            self.components == op2.components)
 
   def __ne__(self, op2):
     return not self.__eq__(op2)
@@ -128,9 +128,10 @@ class Database:
     Raises:
       HWIDException if there is missing field in the database.
     """
+    db_text = file_utils.ReadFile(file_name)
     return Database.LoadData(
-        file_utils.ReadFile(file_name),
-        expected_checksum=(Database.Checksum(file_name)
+        db_text,
+        expected_checksum=(Database.ChecksumForText(db_text)
                            if verify_checksum else None))
 
   @staticmethod
@@ -1284,6 +1285,7 @@ class Components:
 _PatternDatum = collections.namedtuple('_PatternDatum',
                                        ['encoding_scheme', 'fields'])
 _PatternField = collections.namedtuple('_PatternField', ['name', 'bit_length'])
+_BitEntry = collections.namedtuple('BitEntry', ['field', 'bit_offset'])
 
 
 class Pattern:
@@ -1388,6 +1390,9 @@ class Pattern:
     self._SCHEMA.Validate(pattern_list_expr)
 
     self._image_id_to_pattern = {}
+    # Results of GetBitMapping, keyed by its arguments.  Cleared whenever the
+    # patterns change.
+    self._bit_mapping_cache = {}
 
     for pattern_expr in pattern_list_expr:
       pattern_obj = _PatternDatum(pattern_expr['encoding_scheme'], [])
@@ -1450,6 +1455,7 @@ class Pattern:
           'The image id %r is already in used.' % image_id)
 
     self._image_id_to_pattern[image_id] = _PatternDatum(encoding_scheme, [])
+    self._bit_mapping_cache.clear()
 
   def AddImageId(self, reference_image_id, image_id):
     """Adds an image id to a pattern by the specific image id.
@@ -1466,6 +1472,7 @@ class Pattern:
           'The image id %r has already been in used.' % image_id)
 
     self._image_id_to_pattern[image_id] = self._GetPattern(reference_image_id)
+    self._bit_mapping_cache.clear()
 
   def AppendField(self, field_name, bit_length, image_id=None):
     """Append a field to the pattern.
@@ -1483,6 +1490,7 @@ class Pattern:
 
     self._GetPattern(image_id).fields.append(
         _PatternField(field_name, bit_length))
+    self._bit_mapping_cache.clear()
 
   def GetEncodingScheme(self, image_id=None):
     """Gets the encoding scheme recorded in the pattern.
@@ -1549,8 +1557,15 @@ class Pattern:
           to the bit offset 1 (which is the second least significant bit)
           of encoded field 'cpu'.
     """
-    BitEntry = collections.namedtuple('BitEntry', ['field', 'bit_offset'])
-
+    cache_key = (image_id, max_bit_length)
+    if cache_key not in self._bit_mapping_cache:
+      self._bit_mapping_cache[cache_key] = self._GetBitMapping(
+          image_id, max_bit_length)
+    # Return a copy so the callers can't change the cached one.
+    return list(self._bit_mapping_cache[cache_key])
+
+  def _GetBitMapping(self, image_id, max_bit_length):
+    """Computes the result of GetBitMapping."""
     total_bit_length = self.GetTotalBitLength(image_id=image_id)
     if max_bit_length is None:
       max_bit_length = total_bit_length
@@ -1575,7 +1590,7 @@ class Pattern:
 
       # Big endian.
       for offset_delta in range(real_length - 1, -1, -1):
-        ret.append(BitEntry(name, offset_delta + field_offset_map[name]))
+        ret.append(_BitEntry(name, offset_delta + field_offset_map[name]))
 
       field_offset_map[name] += real_length
 
@@ -926,6 +926,13 @@ class PatternTest(unittest.TestCase):
                                                   ('a', 3), ('c', 2), ('c', 1),
                                                   ('c', 0)])
 
+    # Changing the pattern updates the bit mapping.
+    pattern.AppendField('b', 1)
+    self.assertEqual(pattern.GetBitMapping(), [('a', 2), ('a', 1), ('a', 0),
+                                               ('a', 3), ('c', 4), ('c', 3),
+                                               ('c', 2), ('c', 1), ('c', 0),
+                                               ('b', 0)])
+
 
 class RulesTest(unittest.TestCase):
 
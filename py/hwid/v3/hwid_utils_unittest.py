@@ -5,6 +5,7 @@
 
 """Integration tests for the HWID v3 framework."""
 
+import copy
 import os
 import unittest
 from unittest import mock
@@ -39,11 +40,16 @@ class _HWIDTestCaseBase(unittest.TestCase):
     for comp_cls, bom1_comp_names in bom1.components.items():
       self.assertEqual(bom1_comp_names, bom2.components[comp_cls])
 
+  @classmethod
+  def setUpClass(cls):
+    # Tests modify the probed results, so each test gets its own copy.
+    cls._probed_results = hwid_utils.GetProbedResults(
+        infile=_TEST_PROBED_RESULTS_PATH)
+
   def setUp(self):
     self.database = Database.LoadFile(_TEST_DATABASE_PATH,
                                       verify_checksum=False)
-    self.probed_results = hwid_utils.GetProbedResults(
-        infile=_TEST_PROBED_RESULTS_PATH)
+    self.probed_results = copy.deepcopy(self._probed_results)
 
 
 class GenerateHWIDTest(_HWIDTestCaseBase):
@@ -58,6 +58,8 @@ _ENCODING_SCHEME_MAP = {
 
 _HEADER_FORMAT_STR = '{0:01b}{1:0%db}' % common.IMAGE_ID_BIT_LENGTH
 
+_PROJECT_PATTERN = re.compile(r'^[A-Z0-9]+$')
+
 
 class _IdentityConverter:
   """Identity converter.
@@ -84,12 +86,11 @@ class _IdentityConverter:
   """
   def __init__(self, base):
     self._base = base
+    self._dash_group_re = re.compile('.{1,%d}' % base.DASH_INSERTION_WIDTH)
 
   def FormatComponentsField(self, encoded_string):
     """Insert dash to encoded components string"""
-    return '-'.join([encoded_string[idx:idx + self._base.DASH_INSERTION_WIDTH]
-                     for idx in range(0, len(encoded_string),
-                                      self._base.DASH_INSERTION_WIDTH)])
+    return '-'.join(self._dash_group_re.findall(encoded_string))
 
   def EncodeComponentsBitset(self, encoding_pattern_index, image_id,
                              components_bitset):
@@ -177,7 +178,7 @@ def _VerifyPart(condition, part, value):
 
 
 def _VerifyProjectPart(project):
-  _VerifyPart(lambda val: re.match(r'^[A-Z0-9]+$', val), 'project', project)
+  _VerifyPart(_PROJECT_PATTERN.match, 'project', project)
 
 
 def _VerifyEncodingSchemePart(encoding_scheme):
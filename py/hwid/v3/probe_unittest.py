@@ -16,8 +16,9 @@ TEST_DATABASE_PATH = os.path.join(TEST_DATA_PATH, 'test_probe_db.yaml')
 
 
 class GenerateBOMFromProbedResultsTest(unittest.TestCase):
-  def setUp(self):
-    self.database = Database.LoadFile(TEST_DATABASE_PATH, verify_checksum=False)
+  @classmethod
+  def setUpClass(cls):
+    cls.database = Database.LoadFile(TEST_DATABASE_PATH, verify_checksum=False)
 
   def testEncodingPatternIndexAndImageIdCorrect(self):
     bom = probe.GenerateBOMFromProbedResults(
@@ -4,6 +4,9 @@
 
 """Implementation of HWID v3 encoder and decoder."""
 
+import itertools
+import operator
+
 from cros.factory.hwid.v3.bom import BOM
 from cros.factory.hwid.v3 import common
 from cros.factory.hwid.v3.identity import Identity
@@ -51,13 +54,18 @@ def BOMToIdentity(database, bom, brand_code=None, encoded_configless=None):
     if encoded_fields[field_name] >= (2 ** bit_length):
       raise common.HWIDException('Index overflow in field %r' % field_name)
 
-  # Fill in each bit.
-  components_bitset = ''
-  for (field, bit_offset) in database.GetBitMapping(bom.image_id):
-    components_bitset += '01'[(encoded_fields[field] >> bit_offset) & 1]
+  # Fill in each bit into an integer, and format it as a binary string once.
+  bit_mapping = database.GetBitMapping(bom.image_id)
+  bits = 0
+  # Bits of the same field come in runs, so look each field up once per run.
+  for field, entries in itertools.groupby(bit_mapping, operator.itemgetter(0)):
+    value = encoded_fields[field]
+    for unused_field, bit_offset in entries:
+      bits = (bits << 1) | ((value >> bit_offset) & 1)
 
   # Set stop bit.
-  components_bitset += '1'
+  bits = (bits << 1) | 1
+  components_bitset = format(bits, '0%db' % (len(bit_mapping) + 1))
 
   return Identity.GenerateFromBinaryString(
       database.GetEncodingScheme(bom.image_id), database.project,
@@ -106,8 +114,9 @@ def IdentityToBOM(database, identity):
                     in database.GetEncodedFieldsBitLength(image_id)}
   bit_mapping = database.GetBitMapping(image_id=image_id,
                                        max_bit_length=bit_length)
-  for i, (field, bit_offset) in enumerate(bit_mapping):
-    encoded_fields[field] += int(identity.components_bitset[i], 2) << bit_offset
+  for (field, bit_offset), bit in zip(bit_mapping, identity.components_bitset):
+    if bit == '1':
+      encoded_fields[field] |= 1 << bit_offset
 
   # Construct the components dict.
   components = {comp_cls: [] for comp_cls in database.GetComponentClasses()}
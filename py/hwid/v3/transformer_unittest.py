@@ -18,9 +18,12 @@ _TEST_DATABASE_FILENAME = os.path.join(
 
 
 class _TransformerTestBase(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.database = Database.LoadFile(_TEST_DATABASE_FILENAME,
+                                     verify_checksum=False)
+
   def setUp(self):
-    self.database = Database.LoadFile(_TEST_DATABASE_FILENAME,
-                                      verify_checksum=False)
     self.test_data = [
         # Simplest case.
         ('001', BOM(0, 0, dict(cpu=['cpu_0'], audio=[], camera=[],
@@ -42,8 +42,11 @@ def VerifyComponentStatus(database, bom, mode, current_phase=None):
     HWIDException if verification fails.
   """
   for comp_cls, comp_names in bom.components.items():
+    if not comp_names:
+      continue
+    comp_infos = database.GetComponents(comp_cls)
     for comp_name in comp_names:
-      status = database.GetComponents(comp_cls)[comp_name].status
+      status = comp_infos[comp_name].status
       if status == common.COMPONENT_STATUS.supported:
         continue
       if status == common.COMPONENT_STATUS.unqualified:
@@ -141,34 +144,24 @@ def VerifyBOM(database, decoded_bom, probed_bom):
   Raises:
     HWIDException if the BOM objects mismatch.
   """
-  def _GetExtraComponents(comps1, comps2):
-    num_comps = collections.defaultdict(int)
-    for comp in comps1:
-      num_comps[comp] += 1
-
-    for comp in comps2:
-      if comp in num_comps:
-        num_comps[comp] -= 1
-
-    results = [[comp] * num_comp
-               for comp, num_comp in num_comps.items() if num_comp > 0]
-    return sorted(sum(results, []))
-
   # We only verify the components listed in the pattern.
   for comp_cls in database.GetActiveComponentClasses(decoded_bom.image_id):
     if comp_cls not in probed_bom.components:
       raise common.HWIDException(
           'Component class %r is not found in probed BOM.' % comp_cls)
 
+    decoded_comps = collections.Counter(decoded_bom.components[comp_cls])
+    probed_comps = collections.Counter(probed_bom.components[comp_cls])
+    if decoded_comps == probed_comps:
+      continue
+
     err_msgs = []
 
-    extra_components = _GetExtraComponents(decoded_bom.components[comp_cls],
-                                           probed_bom.components[comp_cls])
+    extra_components = sorted((decoded_comps - probed_comps).elements())
     if extra_components:
       err_msgs.append('has extra components: %r' % extra_components)
 
-    missing_components = _GetExtraComponents(probed_bom.components[comp_cls],
-                                             decoded_bom.components[comp_cls])
+    missing_components = sorted((probed_comps - decoded_comps).elements())
     if missing_components:
       err_msgs.append('is missing components: %r' % missing_components)
 
@@ -19,9 +19,11 @@ _TEST_DATABASE_PATH = os.path.join(
 
 
 class VerifyComponentStatusTest(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.database = Database.LoadFile(_TEST_DATABASE_PATH, verify_checksum=False)
+
   def setUp(self):
-    self.database = Database.LoadFile(_TEST_DATABASE_PATH,
-                                      verify_checksum=False)
     self.boms = {}
     for status in common.COMPONENT_STATUS:
       bom = BOM(encoding_pattern_index=0,
@@ -75,9 +77,11 @@ class VerifyComponentStatusTest(unittest.TestCase):
 
 
 class VerifyPhaseTest(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.database = Database.LoadFile(_TEST_DATABASE_PATH, verify_checksum=False)
+
   def setUp(self):
-    self.database = Database.LoadFile(_TEST_DATABASE_PATH,
-                                      verify_checksum=False)
     self.possible_names = list(self.database.GetComponents('firmware_keys'))
 
   @staticmethod
@@ -146,9 +150,11 @@ class VerifyPhaseTest(unittest.TestCase):
 
 
 class VerifyBOMTest(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.database = Database.LoadFile(_TEST_DATABASE_PATH, verify_checksum=False)
+
   def setUp(self):
-    self.database = Database.LoadFile(_TEST_DATABASE_PATH,
-                                      verify_checksum=False)
     self.decoded_bom = BOM(
         encoding_pattern_index=0, image_id=0, components={
             'cpu': ['cpu_supported', 'cpu_unqualified'],
@@ -198,14 +204,19 @@ class VerifyBOMTest(unittest.TestCase):
         'ram': [],
         'firmware_keys': ['firmware_keys_dev']})
 
-    self.assertRaises(common.HWIDException, verifier.VerifyBOM,
-                      self.database, self.decoded_bom, probed_bom)
+    self.assertRaisesRegex(
+        common.HWIDException,
+        r"has extra components: \['cpu_supported'\] and is missing "
+        r"components: \['cpu_deprecated'\]",
+        verifier.VerifyBOM, self.database, self.decoded_bom, probed_bom)
 
 
 class VerifyConfiglessTest(unittest.TestCase):
+  @classmethod
+  def setUpClass(cls):
+    cls.database = Database.LoadFile(_TEST_DATABASE_PATH, verify_checksum=False)
+
   def setUp(self):
-    self.database = Database.LoadFile(_TEST_DATABASE_PATH,
-                                      verify_checksum=False)
     self.probed_bom = BOM(
         encoding_pattern_index=0, image_id=0, components={
             'storage': ['KLMCG2KCTA-B041_0200000000000000'],
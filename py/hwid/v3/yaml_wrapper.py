@@ -12,6 +12,7 @@ import collections
 import functools
 
 from yaml import *  # pylint: disable=wildcard-import,unused-wildcard-import
+from yaml import __with_libyaml__
 from yaml import constructor
 from yaml import nodes
 from yaml import resolver
@@ -22,7 +23,12 @@ from cros.factory.test.l10n import regions
 from cros.factory.utils import schema
 from cros.factory.utils import yaml_utils
 
-class V3Loader(SafeLoader):
+# Parse with libyaml when it is available, which is much faster than the pure
+# Python parser.
+_BaseLoader = CSafeLoader if __with_libyaml__ else SafeLoader
+
+
+class V3Loader(_BaseLoader):
   """A HWID v3 yaml Loader for patch separation."""
 
 
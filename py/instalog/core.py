@@ -25,6 +25,9 @@ UP = 'UP'
 STOPPING = 'STOPPING'
 DOWN = 'DOWN'
 
+# States in which the Run loop should exit.
+_STOPPED_STATES = frozenset([STOPPING, DOWN])
+
 
 class Instalog(plugin_sandbox.CoreAPI):
 
@@ -55,6 +58,8 @@ class Instalog(plugin_sandbox.CoreAPI):
     """
     self._rpc_lock = threading.Lock()
     self._state = DOWN
+    # Set by plugins when they may be ready to advance their states.
+    self._advance_event = threading.Event()
 
     # Store the node ID.
     self._node_id = node_id
@@ -87,7 +92,7 @@ class Instalog(plugin_sandbox.CoreAPI):
     def ShutdownThread():
       self._rpc_server.shutdown()
       self._rpc_server.server_close()
-    t = threading.Thread(target=ShutdownThread)
+    t = threading.Thread(target=ShutdownThread, daemon=True)
     t.start()
 
   def _PreprocessConfigEntries(self, input_plugins, output_plugins):
@@ -157,8 +162,7 @@ class Instalog(plugin_sandbox.CoreAPI):
     # Make sure we have a store_path and data_dir for the plugin.
     store_path = os.path.join(self._data_dir, '%s.json' % plugin_id)
     data_dir = os.path.join(self._data_dir, plugin_id)
-    if not os.path.exists(data_dir):
-      os.makedirs(data_dir)
+    os.makedirs(data_dir, exist_ok=True)
 
     return plugin_sandbox.PluginSandbox(
         plugin_type=plugin_type,
@@ -193,11 +197,13 @@ class Instalog(plugin_sandbox.CoreAPI):
     logging.info('Syncing consumer lists')
     logging.debug('Our consumer list: %s', consumers)
     logging.debug('Buffer consumer list: %s', buffer_consumers)
+    consumer_set = set(consumers)
+    buffer_consumer_set = set(buffer_consumers)
     for c in buffer_consumers:
-      if c not in consumers:
+      if c not in consumer_set:
         self._buffer.CallPlugin('RemoveConsumer', c)
     for c in consumers:
-      if c not in buffer_consumers:
+      if c not in buffer_consumer_set:
         self._buffer.CallPlugin('AddConsumer', c)
 
   def Run(self):
@@ -207,22 +213,25 @@ class Instalog(plugin_sandbox.CoreAPI):
       plugin_states = {}
       for plugin in self._plugins.values():
         plugin_states[plugin] = plugin.GetState()
-      while self._state not in (STOPPING, DOWN):
+      while self._state not in _STOPPED_STATES:
         # If Instalog is just starting, check to see that all plugins have left
         # the STARTING state.  When this occurs, Instalog's state should change
         # to UP.
         if (self._state is STARTING and
-            all([state is not plugin_sandbox.STARTING
-                 for state in plugin_states.values()])):
+            all(state is not plugin_sandbox.STARTING
+                for state in plugin_states.values())):
           self._state = UP
+        self._advance_event.clear()
         for plugin in self._plugins.values():
           plugin.AdvanceState()
-          if plugin_states[plugin] != plugin.GetState():
+          state = plugin.GetState()
+          if plugin_states[plugin] != state:
             logging.info('Plugin %s changed state from %s to %s',
-                         plugin.plugin_id, plugin_states[plugin],
-                         plugin.GetState())
-          plugin_states[plugin] = plugin.GetState()
-        time.sleep(1)
+                         plugin.plugin_id, plugin_states[plugin], state)
+            plugin_states[plugin] = state
+        # Flushing and pausing plugins don't notify when they are done, so
+        # keep polling at least once a second.
+        self._advance_event.wait(1)
     except Exception as e:
       logging.exception(e)
 
@@ -384,3 +393,12 @@ class Instalog(plugin_sandbox.CoreAPI):
       A string representing the ID of this Instalog node.
     """
     return self._node_id
+
+  def NotifyStateChange(self, plugin):
+    """Wakes up the Run loop to advance the state of the specified plugin.
+
+    Args:
+      plugin: PluginSandbox object whose state may be advanced.
+    """
+    del plugin
+    self._advance_event.set()
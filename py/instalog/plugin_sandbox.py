@@ -8,6 +8,7 @@ Loads the plugin class instance (using plugin_loader), manages the plugin's
 state, and implements PluginAPI functions for the plugin.
 """
 
+import collections
 import inspect
 import logging
 import os
@@ -63,6 +64,10 @@ class CoreAPI:
     """See Core.GetNodeID."""
     raise NotImplementedError
 
+  def NotifyStateChange(self, plugin):
+    """See Core.NotifyStateChange.  Optional for cores polling AdvanceState."""
+    del plugin
+
 
 class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
   """Represents a running instance of a particular plugin.
@@ -161,8 +166,13 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
         superclass=superclass, config=self.config, store=self.store,
         plugin_api=self, _plugin_class=_plugin_class)
     self._plugin = None
+    # Whether the plugin class defines its own Main.  Set on each _Load.
+    self._has_main = False
     self._state = DOWN
     self._event_stream_map = {}
+    # Serializes registering a new event stream against the PAUSING -> PAUSED
+    # transition, which requires that no event streams are open.
+    self._event_stream_lock = threading.Lock()
 
     # Store the target processed event count and timeout for FLUSHING state.
     self._flushing_target = None
@@ -170,7 +180,8 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
 
     # Store information about the last _UNEXPECTED_ACCESSES_MAX unexpected
     # accesses.
-    self._unexpected_accesses = []
+    self._unexpected_accesses = collections.deque(
+        maxlen=_UNEXPECTED_ACCESSES_MAX)
 
     # Store the last exception caused by SetUp, Main or TearDown.
     self._last_exception = None
@@ -237,12 +248,10 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
     """Record an unexpected access from the plugin (i.e. in a stopped state).
 
     At most _UNEXPECTED_ACCESSES_MAX entries are stored in
-    self._unexpected_accesses for debugging purposes.  This function is not
-    thread-safe, so it is possible that unexpected accesses may be inserted
-    out-of-order, or more than _UNEXPECTED_ACCESSES_MAX entries will be removed
-    in the while loop.
+    self._unexpected_accesses for debugging purposes, most recent first.  The
+    bounded deque drops the oldest entry on insertion.
     """
-    self._unexpected_accesses.insert(0, {
+    self._unexpected_accesses.appendleft({
         'caller_name': caller_name,
         'plugin_id': self.plugin_id,
         'plugin_ref': plugin_ref,
@@ -250,8 +259,6 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
         'stack': stack,
         'state': self._state,
         'timestamp': time.time()})
-    while len(self._unexpected_accesses) > _UNEXPECTED_ACCESSES_MAX:
-      self._unexpected_accesses.pop()
 
   def _AskGatekeeper(self, plugin, state_map):
     """Ensure a plugin is properly registered and in the correct state.
@@ -269,15 +276,12 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
       is trying to access core functionality that it should not
       (action is self._ERROR).
     """
-    caller_name = debug_utils.GetCallerName()
-    self.debug('_AskGatekeeper for plugin %s (%s) on function %s',
-               self.plugin_id, self._state, caller_name)
-
     # Ensure that the plugin instance is currently registered.  If the plugin
     # has previously been restarted, and some remaining threads are still
     # attempting to access core, we need to record the access for debugging
     # purposes.
     if plugin is not self._plugin:
+      caller_name = debug_utils.GetCallerName()
       self._RecordUnexpectedAccess(plugin, caller_name, inspect.stack())
       self.critical(
           'Plugin %s (%s) called core %s: Unexpected plugin instance',
@@ -287,6 +291,12 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
     # Map the plugin's state to our action (default self._ERROR).
     action = state_map.get(self._state, self._ERROR)
 
+    if action is self._ALLOW:
+      return
+
+    # Only look up the caller on the slow paths; the plugin's own PluginAPI
+    # function logs the successful call itself.
+    caller_name = debug_utils.GetCallerName()
     if action is self._WAIT:
       self.info(
           'Plugin %s (%s) called core %s: Currently in a paused state',
@@ -347,12 +357,14 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
     """Asks the PluginLoader factory to give us a new plugin instance."""
     assert self._plugin is None
     self._plugin = self._loader.Create()
+    self._has_main = 'Main' in type(self._plugin).__dict__
 
   def Start(self, sync=False):
     """Starts the plugin."""
     self._CheckStateCommand(DOWN)
     self._Load()
     self._state = STARTING
+    self._core_api.NotifyStateChange(self)
     if sync:
       self.AdvanceState(sync)
 
@@ -360,6 +372,7 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
     """Stops the plugin."""
     self._CheckStateCommand([UP, PAUSED])
     self._state = STOPPING
+    self._core_api.NotifyStateChange(self)
     if sync:
       self.AdvanceState(sync)
 
@@ -378,6 +391,7 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
     unused_completed_count, flushing_target = self.GetProgress()
     self._flushing_target = flushing_target
     self._state = FLUSHING
+    self._core_api.NotifyStateChange(self)
 
     if sync:
       self.AdvanceState(sync)
@@ -392,6 +406,7 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
     """Pauses the plugin."""
     self._CheckStateCommand(UP)
     self._state = PAUSING
+    self._core_api.NotifyStateChange(self)
     if sync:
       self.AdvanceState(sync)
 
@@ -399,6 +414,7 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
     """Unpauses the plugin."""
     self._CheckStateCommand(PAUSED)
     self._state = UNPAUSING
+    self._core_api.NotifyStateChange(self)
     if sync:
       self.AdvanceState(sync)
 
@@ -442,6 +458,9 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
         except Exception as e:
           self._last_exception = e
           self.exception('Exception caused by %s', fn.__name__)
+        finally:
+          # The next AdvanceState call can move on to the next state.
+          self._core_api.NotifyStateChange(self)
       t = threading.Thread(target=RunAndCaptureException, args=(fn,))
       t.start()
       if sync:
@@ -466,7 +485,7 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
     # TODO(kitching): Come up with a better way of differentiating plugins which
     #                 define Main, and those which do not.
     if (self._state in (UP, PAUSING, PAUSED) and
-        'Main' in self._plugin.__class__.__dict__ and
+        self._has_main and
         not self._main_thread.is_alive()):
       self.debug('AdvanceState unexpected main thread dead')
       self.error('Main thread died unexpectedly, '
@@ -525,8 +544,9 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
 
     elif self._state is PAUSING:
       self.debug('AdvanceState on PAUSING')
-      if not self._event_stream_map:
-        self._state = PAUSED
+      with self._event_stream_lock:
+        if not self._event_stream_map:
+          self._state = PAUSED
 
     elif self._state is UNPAUSING:
       self.debug('AdvanceState on UNPAUSING')
@@ -600,7 +620,15 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
 
     buffer_stream = self._core_api.NewStream(self)
     plugin_stream = datatypes.EventStream(plugin, self)
-    self._event_stream_map[plugin_stream] = buffer_stream
+    with self._event_stream_lock:
+      # The plugin may have moved on to PAUSED while the buffer stream was
+      # being opened.  Check again before registering the stream.
+      try:
+        self._AskGatekeeper(plugin, self._GATEKEEPER_ALLOW_UP_PAUSING_STOPPING)
+      except (plugin_base.WaitException, plugin_base.UnexpectedAccess):
+        buffer_stream.Abort()
+        raise
+      self._event_stream_map[plugin_stream] = buffer_stream
     return plugin_stream
 
   def EventStreamNext(self, plugin, plugin_stream, timeout=1):
@@ -647,18 +675,19 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
     """See PluginAPI.EventStreamCommit."""
     self._AskGatekeeper(plugin, self._GATEKEEPER_ALLOW_UP_PAUSING_STOPPING)
     self.debug('EventStreamCommit called with state=%s', self._state)
-    self._RecordUnexpectedAccess(plugin, 'EventStreamAbort', inspect.stack())
-    if plugin_stream not in self._event_stream_map:
+    # Pop in a single step so that two threads cannot both commit a stream.
+    buffer_stream = self._event_stream_map.pop(plugin_stream, None)
+    if buffer_stream is None:
       raise plugin_base.UnexpectedAccess
-    return self._event_stream_map.pop(plugin_stream).Commit()
+    return buffer_stream.Commit()
 
   def EventStreamAbort(self, plugin, plugin_stream):
     """See PluginAPI.EventStreamAbort."""
     # TODO(kitching): Test in unittest.
     self._AskGatekeeper(plugin, self._GATEKEEPER_ALLOW_UP_PAUSING_STOPPING)
     self.debug('EventStreamAbort called with state=%s', self._state)
-    self._RecordUnexpectedAccess(plugin, 'EventStreamAbort', inspect.stack())
-    if plugin_stream not in self._event_stream_map:
+    buffer_stream = self._event_stream_map.pop(plugin_stream, None)
+    if buffer_stream is None:
       raise plugin_base.UnexpectedAccess
     # If no events were processed, use Commit() instead of Abort().  This
     # accounts for the case where all events were skipped because of the
@@ -667,5 +696,5 @@ class PluginSandbox(plugin_base.PluginAPI, log_utils.LoggerMixin):
     # grow without the possibility of truncation.  Thus we force Commit() to
     # make sure any events "hidden" by the FlowPolicy are committed.
     if plugin_stream.GetCount() == 0:
-      return self._event_stream_map.pop(plugin_stream).Commit()
-    return self._event_stream_map.pop(plugin_stream).Abort()
+      return buffer_stream.Commit()
+    return buffer_stream.Abort()
@@ -303,12 +303,66 @@ class TestPluginSandbox(unittest.TestCase):
 
     with mock.patch.object(buffer_stream, 'Commit', return_value=True):
       p.EventStreamCommit(p._plugin, plugin_stream)
+    # A successful commit is not an unexpected access.
+    self.assertEqual(0, len(p._unexpected_accesses))
 
     p.AdvanceState(False)
     self.assertEqual(p.GetState(), plugin_sandbox.PAUSED)
 
     p.Stop(True)
 
+  def testNewStreamWhilePausing(self):
+    """Tests a stream opened while the plugin advances to PAUSED."""
+    # pylint: disable=protected-access
+    p = plugin_sandbox.PluginSandbox(
+        'plugin_id', _plugin_class=WellBehavedInput)
+    self._plugin_objects.append(p)
+
+    p.Start(True)
+    p.Pause(False)
+
+    buffer_stream = plugin_base.BufferEventStream()
+
+    def NewBufferStream(unused_plugin):
+      # No stream is registered yet, so the plugin can become PAUSED while
+      # the buffer stream is being opened.
+      p.AdvanceState(False)
+      self.assertEqual(p.GetState(), plugin_sandbox.PAUSED)
+      return buffer_stream
+
+    with mock.patch.object(p._core_api, 'NewStream',
+                           side_effect=NewBufferStream):
+      with mock.patch.object(p._core_api, 'GetNodeID', return_value='testing'):
+        with mock.patch.object(buffer_stream, 'Abort') as abort:
+          with self.assertRaises(plugin_base.WaitException):
+            p.NewStream(p._plugin)
+    abort.assert_called_once_with()
+    self.assertEqual(p._event_stream_map, {})
+
+    p.Stop(True)
+
+  def testNotifyStateChange(self):
+    """Tests that the core is notified when the plugin can advance state."""
+    # pylint: disable=protected-access
+    p = plugin_sandbox.PluginSandbox(
+        'plugin_id', _plugin_class=WellBehavedInputNoMain)
+    self._plugin_objects.append(p)
+    notified = threading.Event()
+
+    with mock.patch.object(p._core_api, 'NotifyStateChange',
+                           side_effect=lambda plugin: notified.set()):
+      p.Start(False)
+      self.assertTrue(notified.is_set())
+      notified.clear()
+
+      # Notified again once SetUp is done.
+      p.AdvanceState(False)
+      self.assertTrue(notified.wait(5))
+      p.AdvanceState(False)
+      self.assertEqual(p.GetState(), plugin_sandbox.UP)
+
+    p.Stop(True)
+
   def testInvalidCoreAPI(self):
     """Tests that a sandbox passed an invalid CoreAPI object will complain."""
     with self.assertRaisesRegex(TypeError, 'Invalid CoreAPI object'):
@@ -174,45 +174,54 @@ class OutputBigQuery(plugin_base.OutputPlugin):
     """Retrieves events from event_stream and dumps them to the json_path.
 
     Returns:
-      A tuple of (event_count, row_count), where:
+      A tuple of (event_count, row_count, file_size), where:
         event_count: The number of events from event_stream.
         row_count: The number of BigQuery format events from event_stream.
+        file_size: The size of json_path in bytes.
     """
     event_count = 0
     row_count = 0
     partition_set = set()
-    with open(json_path, 'w') as f:
-      for event in event_stream.iter(timeout=self.args.interval,
-                                     count=self.args.batch_size):
-        event_count += 1
-        if self.args.gcs_target_dir and not self.UploadAttachments(event):
-          return event_count, -1
-        json_row = None
-        try:
-          json_row = self.ConvertEventToRow(event)
-        except Exception:
-          self.warning('Error converting event to row: %s',
-                       event, exc_info=True)
-        if json_row is not None:
-          if len(json_row) > _ROW_SIZE_LIMIT:
-            # TODO(chuntsen): Find a better way to handle too big row.
-            cur_time = datetime.datetime.now()
-            big_event_filename = cur_time.strftime('Big_event_%Y%m%d_%H%M%S.%f')
-            big_event_path = os.path.join(self.GetDataDir(),
-                                          big_event_filename)
-            self.warning('Find a too big event (row size = %d bytes), and save '
-                         'it to %s', len(json_row), big_event_path)
-            with open(big_event_path, 'w') as g:
-              g.write(event.Serialize() + '\n')
-          else:
-            f.write(json_row + '\n')
-            row_count += 1
-            # We are using time column as the timePartitioning field
-            partition_set.add(event['time'] // _SECONDS_IN_A_DAY)
-        if len(partition_set) == _PARTITION_LIMIT:
-          break
-
-    return event_count, row_count
+    rows = []
+    file_size = 0
+    for event in event_stream.iter(timeout=self.args.interval,
+                                   count=self.args.batch_size):
+      event_count += 1
+      if self.args.gcs_target_dir and not self.UploadAttachments(event):
+        return event_count, -1, 0
+      json_row = None
+      try:
+        json_row = self.ConvertEventToRow(event)
+      except Exception:
+        self.warning('Error converting event to row: %s',
+                     event, exc_info=True)
+      if json_row is not None:
+        if len(json_row) > _ROW_SIZE_LIMIT:
+          # TODO(chuntsen): Find a better way to handle too big row.
+          cur_time = datetime.datetime.now()
+          big_event_filename = cur_time.strftime('Big_event_%Y%m%d_%H%M%S.%f')
+          big_event_path = os.path.join(self.GetDataDir(),
+                                        big_event_filename)
+          self.warning('Find a too big event (row size = %d bytes), and save '
+                       'it to %s', len(json_row), big_event_path)
+          with open(big_event_path, 'w') as g:
+            g.write(event.Serialize() + '\n')
+        else:
+          row = json_row.encode('utf-8') + b'\n'
+          rows.append(row)
+          file_size += len(row)
+          row_count += 1
+          # We are using time column as the timePartitioning field
+          partition_set.add(event['time'] // _SECONDS_IN_A_DAY)
+      if len(partition_set) == _PARTITION_LIMIT:
+        break
+
+    # Write the whole batch at once rather than crossing into the file object
+    # for every row.
+    with open(json_path, 'wb') as f:
+      f.writelines(rows)
+
+    return event_count, row_count, file_size
 
   def PrepareAndUpload(self):
     """Retrieves events, converts them to BigQuery format, and uploads them."""
@@ -222,7 +231,8 @@ class OutputBigQuery(plugin_base.OutputPlugin):
 
     with file_utils.UnopenedTemporaryFile(
         prefix='output_bigquery_') as json_path:
-      event_count, row_count = self.PrepareFile(event_stream, json_path)
+      event_count, row_count, file_size = self.PrepareFile(event_stream,
+                                                           json_path)
 
       if self.IsStopping():
         self.info('Plugin is stopping! Abort %d events', event_count)
@@ -252,7 +262,7 @@ class OutputBigQuery(plugin_base.OutputPlugin):
           job = self.client.load_table_from_file(
               file_obj=f,
               destination=self.table_ref,
-              size=os.path.getsize(json_path),
+              size=file_size,
               num_retries=_BIGQUERY_REQUEST_MAX_FAILURES,
               job_id=job_id,
               job_config=job_config)
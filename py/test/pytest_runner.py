@@ -12,6 +12,7 @@ import signal
 import sys
 
 from cros.factory.device import device_utils
+from cros.factory.goofy import prespawner
 from cros.factory.test import session
 from cros.factory.test.state import TestState
 from cros.factory.test.utils import pytest_utils
@@ -25,6 +26,15 @@ from cros.factory.utils import type_utils
 # pylint: disable=no-name-in-module
 from cros.factory.external.setproctitle import setproctitle
 
+# Modules used by most pytests.  They are imported before the process waits for
+# its test, so a prespawned process has loaded them by the time it is used.
+# pylint: disable=unused-import,wrong-import-order
+from cros.factory.test import device_data
+from cros.factory.test import event_log
+from cros.factory.test import i18n
+from cros.factory.test import test_case
+# pylint: enable=unused-import,wrong-import-order
+
 
 def RunPytest(test_info):
   """Runs a pytest, saving a pickled (status, error_msg) tuple to the
@@ -76,12 +86,14 @@ def RunPytest(test_info):
 
 
 def main():
-  # Load pickle object from the binary data directly to prevent potential
+  prespawner.NotifyReady()
+  # Read the message from the binary data directly to prevent potential
   # decoding errors.
-  env, info = pickle.load(sys.stdin.buffer)
-  if not env:
+  message = prespawner.ReadMessage(sys.stdin.buffer)
+  if not message:
     sys.exit(0)
-  os.environ.update(env)
+  env, info = message
+  prespawner.UpdateEnviron(env)
 
   log_utils.InitLogging(info.path)
   if testlog.TESTLOG_ENV_VARIABLE_NAME in os.environ:
@@ -5,7 +5,6 @@
 """Debug utilities."""
 
 import functools
-import inspect
 import logging
 import os
 import socketserver
@@ -174,7 +173,7 @@ def GetCallerName(num_frame=1):
     ValueError if the frame is out of range of the current call stack.
   """
   frame = sys._getframe(num_frame + 1)  # pylint: disable=protected-access
-  return inspect.getframeinfo(frame, 1)[2]
+  return frame.f_code.co_name
 
 
 def NoRecursion(func):
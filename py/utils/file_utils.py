@@ -243,16 +243,27 @@ def TailFile(path, max_length=5 * 1024 * 1024, dut=None):
     data = dut.CheckOutput(['tail', '-c', str(max_length), path])
     size = int(dut.CheckOutput(['stat', '--printf=%s', path]))
     offset = size - len(data.encode('utf-8'))
+    if offset:
+      # Skip the first (probably incomplete) line
+      skipped_line, unused_sep, data = data.partition('\n')
+      offset += len(skipped_line.encode('utf-8')) + 1
   else:
-    offset = max(0, os.path.getsize(path) - max_length)
-    with open(path, encoding='utf-8') as f:
-      f.seek(offset)
-      data = f.read()
+    # Read the tail with a single pread, and skip the first line on the raw
+    # bytes so only the returned part is decoded.
+    fd = os.open(path, os.O_RDONLY)
+    try:
+      offset = max(0, os.fstat(fd).st_size - max_length)
+      data = os.pread(fd, max_length, offset)
+    finally:
+      os.close(fd)
+    if offset:
+      # Skip the first (probably incomplete) line
+      skipped_length = data.find(b'\n') + 1 or len(data)
+      data = data[skipped_length:]
+      offset += skipped_length
+    data = data.decode('utf-8', errors='replace')
 
   if offset:
-    # Skip the first (probably incomplete) line
-    skipped_line, unused_sep, data = data.partition('\n')
-    offset += len(skipped_line) + 1
     data = ('<truncated %d bytes>\n' % offset) + data
   return data
 
@@ -153,6 +153,25 @@ class ReadLinesTest(unittest.TestCase):
     self.assertTrue(lines is None)
 
 
+class TailFileTest(unittest.TestCase):
+  """Unittest for TailFile."""
+
+  def testWholeFile(self):
+    with tempfile.NamedTemporaryFile() as f:
+      f.write(b'line 1\nline 2\n')
+      f.flush()
+      self.assertEqual('line 1\nline 2\n', file_utils.TailFile(f.name))
+
+  def testTruncated(self):
+    with tempfile.NamedTemporaryFile() as f:
+      # The tail starts in the middle of a multi-byte character, and the
+      # remaining data contains invalid UTF-8.
+      f.write('\u00e9'.encode('utf-8') * 10 + b'\nfoo\xff\nbar\n')
+      f.flush()
+      self.assertEqual('<truncated 21 bytes>\nfoo\ufffd\nbar\n',
+                       file_utils.TailFile(f.name, max_length=15))
+
+
 class TempDirectoryTest(unittest.TestCase):
   """Unittest for TempDirectory."""
 